@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the overhead of the VisIt callbacks of VisitInstrumentation.
+
+The callbacks are driven by the pure Python simV2 stand-in in visitor/fake,
+no VisIt installation is needed. Results are written as JSON together with
+the current commit; pass a previous result file with --compare to list every
+case that got slower than the given threshold (exit code 1 if there is one).
+
+    python benchmarks/bench_callbacks.py -o HEAD.json
+    python benchmarks/bench_callbacks.py --compare HEAD.json
+"""
+
+from __future__ import division, print_function
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'visitor', 'fake'))
+sys.path.insert(1, ROOT)
+
+import numpy as np
+import simV2
+
+from visitor import VisitInstrumentation
+
+__author__ = 'Christoph Statz'
+
+clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = (10**3, 10**5, 10**6)
+QUICK_SIZES = (10**3, 10**4)
+DTYPES = ('float64', 'float32', 'int32', 'int64')
+MESH_TYPES = ('rectilinear', 'curvilinear', 'point', 'unstructured')
+VARIABLES = (1, 10, 100, 1000)
+DOMAINS = (1, 16, 256, 4096)
+
+
+def git_commit():
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def nodes_per_axis(size):
+    return max(2, int(round(size ** (1. / 3.))))
+
+
+def rectilinear(size):
+
+    n = nodes_per_axis(size)
+    x = np.linspace(0., 1., n)
+
+    return x, x.copy(), x.copy()
+
+
+def curvilinear(size):
+
+    x = np.linspace(0., 1., nodes_per_axis(size))
+    zz, yy, xx = np.meshgrid(x, x, x, indexing='ij')
+
+    return xx, yy, zz
+
+
+def point(size):
+
+    coordinates = np.random.RandomState(0).random_sample((3, size))
+
+    return coordinates[0], coordinates[1], coordinates[2]
+
+
+def unstructured(size):
+    """Hexahedral mesh of a structured block, returned as (x, y, connectivity, number of elements, z)."""
+
+    n = nodes_per_axis(size)
+    xx, yy, zz = curvilinear(size)
+
+    i = np.arange(n - 1)
+    base = (i[:, None, None] * n * n + i[None, :, None] * n + i[None, None, :]).ravel()
+    corners = np.array([0, 1, n + 1, n, n * n, n * n + 1, n * n + n + 1, n * n + n])
+
+    connectivity = np.empty((len(base), 9), dtype=np.int32)
+    connectivity[:, 0] = simV2.VISIT_CELL_HEX
+    connectivity[:, 1:] = base[:, None] + corners[None, :]
+
+    return xx.ravel(), yy.ravel(), connectivity.ravel(), len(base), zz.ravel()
+
+
+MESHES = dict(rectilinear=(rectilinear, simV2.VISIT_MESHTYPE_RECTILINEAR),
+              curvilinear=(curvilinear, simV2.VISIT_MESHTYPE_CURVILINEAR),
+              point=(point, simV2.VISIT_MESHTYPE_POINT),
+              unstructured=(unstructured, simV2.VISIT_MESHTYPE_UNSTRUCTURED))
+
+
+class Session(object):
+    """Connected instrumentation writing its sim file to a temporary directory."""
+
+    def __init__(self, **kwargs):
+
+        self.prefix = tempfile.mkdtemp(prefix='visitor_bench_')
+        simV2.state.reset()
+        self.v = VisitInstrumentation('bench', 'callback benchmark', prefix=self.prefix, **kwargs)
+        self.v.connect_visit()
+
+    def close(self):
+
+        # The registered callbacks keep the instrumentation alive, drop them so it disconnects.
+        simV2.state.reset()
+        self.v = None
+        gc.collect()
+        shutil.rmtree(self.prefix, ignore_errors=True)
+
+
+def measure(func, repeat):
+
+    func()
+    timings = list()
+
+    for _ in range(repeat):
+        start = clock()
+        func()
+        timings.append(clock() - start)
+
+    timings = np.array(timings)
+
+    return dict(n=repeat, min=float(timings.min()), median=float(np.median(timings)), mean=float(timings.mean()))
+
+
+def bench_variable(sizes, repeat, **kwargs):
+
+    for dtype in DTYPES:
+        for size in sizes:
+            data = np.arange(size).astype(dtype)
+
+            session = Session(**kwargs)
+            session.v.register_mesh('mesh', lambda: point(1), simV2.VISIT_MESHTYPE_POINT, 3)
+            session.v.register_variable('var', 'mesh', lambda: data, simV2.VISIT_VARTYPE_SCALAR, simV2.VISIT_VARCENTERING_NODE)
+
+            yield 'variable/%s/%d' % (dtype, size), measure(lambda: simV2.request_variable('var', 0), repeat)
+            session.close()
+
+
+def bench_mesh(sizes, repeat, **kwargs):
+
+    for mesh_type in MESH_TYPES:
+        build, visit_type = MESHES[mesh_type]
+        for size in sizes:
+            data = build(size)
+
+            session = Session(**kwargs)
+            session.v.register_mesh('mesh', lambda: data, visit_type, 3)
+
+            yield 'mesh/%s/%d' % (mesh_type, size), measure(lambda: simV2.request_mesh('mesh', 0), repeat)
+            session.close()
+
+
+def bench_metadata(repeat, **kwargs):
+
+    for number in VARIABLES:
+        session = Session(**kwargs)
+        session.v.register_mesh('mesh', lambda: point(1), simV2.VISIT_MESHTYPE_POINT, 3)
+        for i in range(number):
+            session.v.register_variable('var_%d' % i, 'mesh', lambda: None, simV2.VISIT_VARTYPE_SCALAR, simV2.VISIT_VARCENTERING_NODE)
+
+        yield 'metadata/variables/%d' % number, measure(simV2.request_metadata, repeat)
+        session.close()
+
+
+def bench_domains(repeat, **kwargs):
+
+    for number in DOMAINS:
+        session = Session(**kwargs)
+        for domain in range(number):
+            session.v.register_mesh('mesh', lambda: point(1), simV2.VISIT_MESHTYPE_POINT, 3, domain=domain, number_of_domains=number)
+            session.v.register_variable('var', 'mesh', lambda: None, simV2.VISIT_VARTYPE_SCALAR, simV2.VISIT_VARCENTERING_NODE, domain=domain)
+
+        yield 'domain_list/domains/%d' % number, measure(lambda: simV2.request_domain_list('mesh'), repeat)
+        yield 'metadata/domains/%d' % number, measure(simV2.request_metadata, repeat)
+        session.close()
+
+
+def run(sizes, repeat, **kwargs):
+
+    results = dict()
+
+    for benchmark in (bench_variable(sizes, repeat, **kwargs), bench_mesh(sizes, repeat, **kwargs),
+                      bench_metadata(repeat, **kwargs), bench_domains(repeat, **kwargs)):
+        for case, result in benchmark:
+            results[case] = result
+            print('%-36s median=%10.3g s  min=%10.3g s' % (case, result['median'], result['min']))
+
+    return results
+
+
+def compare(results, reference, threshold):
+    """Returns the cases of results with a median more than threshold slower than in reference."""
+
+    regressions = list()
+
+    for case in sorted(set(results) & set(reference)):
+        ratio = results[case]['median'] / max(reference[case]['median'], 1e-12)
+        if ratio > 1. + threshold:
+            regressions.append((case, ratio))
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark the VisIt callbacks of VisitInstrumentation.')
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='timed calls per case')
+    parser.add_argument('--quick', action='store_true', help='only use small arrays')
+    parser.add_argument('--cache-budget', type=int, default=None, help='cache_budget of the instrumentation')
+    parser.add_argument('--compare', help='JSON result file of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as regression')
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = run(sizes, args.repeat, cache_budget=args.cache_budget)
+
+    report = dict(commit=git_commit(), python=platform.python_version(), numpy=np.__version__,
+                  repeat=args.repeat, cache_budget=args.cache_budget, results=results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            reference = json.load(f)
+
+        regressions = compare(results, reference['results'], args.threshold)
+
+        print('\nCompared to %s:' % reference.get('commit'))
+        for case, ratio in regressions:
+            print('%-36s %.2fx slower' % (case, ratio))
+
+        if len(regressions) > 0:
+            sys.exit(1)
+
+        print('no regressions above %d%%' % (100 * args.threshold))
+
+
+if __name__ == '__main__':
+    main()
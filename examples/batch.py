@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+from visitor import VisitInstrumentation, VISIT_MESHTYPE_RECTILINEAR, VISIT_VARTYPE_SCALAR, VISIT_VARCENTERING_NODE
+
+__author__ = 'Christoph Statz'
+
+
+x = np.linspace(-1., 1., 64)
+y = np.linspace(-1., 1., 64)
+xx, yy = np.meshgrid(x, y)
+data = np.zeros(xx.shape, dtype=np.float64)
+counter = 0
+
+
+def mesh_dp(*args, **kwargs):
+    return x, y
+
+def data_dp(*args, **kwargs):
+    return data
+
+def cycle_time_provider(*args, **kwargs):
+    return counter, counter*0.1
+
+def step(*args, **kwargs):
+    global counter
+    counter += 1
+    data[:] = np.sin(xx*np.pi + 0.1*counter) * np.cos(yy*np.pi)
+
+def main():
+
+    name = 'batch_example'
+    prefix = '.'
+    description = 'This example demonstrates saving images in batch mode'
+
+    v = VisitInstrumentation(name, description, prefix=prefix, step=step, cycle_time_provider=cycle_time_provider)
+
+    mesh_name = 'example_r2'
+    v.register_mesh(mesh_name, mesh_dp, VISIT_MESHTYPE_RECTILINEAR, 2, static=True)
+    v.register_variable('d', mesh_name, data_dp, VISIT_VARTYPE_SCALAR, VISIT_VARCENTERING_NODE)
+
+    plots = [{'type': 'Pseudocolor', 'variable': 'd', 'options': {'colorTableName': 'hot'}}]
+    v.enable_batch(plots, every=10, width=800, height=800)
+    v.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -22,9 +22,12 @@ def dp(*args, **kwargs):
 def cycle_time_provider(*args, **kwargs):
     return counter, counter*np.pi/size
 
+history = None
+
 def step(*args, **kwargs):
     global counter
     counter += 1
+    history.append(counter, wave_function(x)[0])
 
 def main():
 
@@ -32,8 +35,11 @@ def main():
     prefix = '.'
     description = 'This example demonstrates the instrumentation of a simulation based resulting curve data.'
 
+    global history
+
     v = VisitInstrumentation(name, description, prefix=prefix, step=step, cycle_time_provider=cycle_time_provider)
     v.register_curve('wave_packet', dp)
+    history = v.register_history('wave_packet_origin', 10000, max_points=1000, xlabel='cycle')
     v.run()
 
 if __name__ == '__main__':
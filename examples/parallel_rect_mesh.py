@@ -4,7 +4,8 @@
 from __future__ import division
 
 import numpy as np
-from visitor import ParallelVisitInstrumentation, VISIT_MESHTYPE_RECTILINEAR
+import visitor
+from visitor import ParallelVisitInstrumentation
 from mpi4py import MPI
 
 
@@ -38,10 +39,11 @@ def main():
     prefix = '.'
     description = 'This example demonstrates the instrumentation of a simulation based on a rectilinear mesh'
 
+    # Only rank 0 discovers VisIt, the VISIT_* names are used after construction.
     v = ParallelVisitInstrumentation(name, description, prefix=prefix)
 
     mesh_name = 'parallel_example_r3'
-    mesh_type = VISIT_MESHTYPE_RECTILINEAR
+    mesh_type = visitor.VISIT_MESHTYPE_RECTILINEAR
 
     if comm_rank==1:
         v.register_mesh(mesh_name, dp, mesh_type, 3, xunits="cm", yunits="cm", xlabel="a", ylabel="b", zunits="cm", zlabel="c", domain=98, number_of_domains=100, domain_piece_name="dom_%d" % comm_rank)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import os
+import sys
+
+# Replace simV2 by the stand-in, no VisIt installation is needed for replaying.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visitor', 'fake'))
+
+import numpy as np
+from visitor import VisitInstrumentation, VISIT_MESHTYPE_RECTILINEAR, VISIT_VARTYPE_SCALAR, VISIT_VARCENTERING_NODE
+from visitor.replay import replay, summary
+
+__author__ = 'Christoph Statz'
+
+
+x = np.linspace(-5., 4., 100)
+y = np.linspace(0., 10., 100)
+z = np.linspace(-20., -10., 100)
+d = np.zeros((100, 100, 100))
+
+
+def step():
+    d[:] += 1.
+
+
+def main():
+    """
+    Record a session by passing record_file='session.jsonl' to the instrumentation of
+    the simulation (or call start_recording), then replay it offline with
+
+        python replay.py session.jsonl
+
+    The registrations have to match the recorded session.
+    """
+
+    v = VisitInstrumentation('replay_example', 'Replays a recorded VisIt session', prefix='.', step=step)
+
+    v.register_mesh('example_r3', lambda: (x, y, z), VISIT_MESHTYPE_RECTILINEAR, 3)
+    v.register_variable('d', 'example_r3', lambda: d, VISIT_VARTYPE_SCALAR, VISIT_VARCENTERING_NODE)
+
+    results = replay(sys.argv[1], v, step=step)
+    print(summary(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 # TODO: Things that might be implemented some time
 
 #VisItExecuteCommand
-#VisItSaveWindow
-#VisItInitializeRuntime
 
 """
+Used by the batch mode (VisitInstrumentation.enable_batch):
+VisItInitializeRuntime, VisItSaveWindow, VisItAddPlot, VisItAddOperator, VisItDrawPlots,
+VisItSetPlotOptions* and VisItSetOperatorOptions*.
+
 Excerpt from the visit/simv2 sources:
 int VisItAddPlot(const char *plotType, const char *var);
 int VisItAddOperator(const char *operatorType, int applyToAll);
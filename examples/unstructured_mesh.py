@@ -4,22 +4,24 @@
 from __future__ import division
 
 import numpy as np
-from visitor import VisitInstrumentation, VISIT_CELL_BEAM, VISIT_MESHTYPE_UNSTRUCTURED
+from visitor import VisitInstrumentation, VISIT_MESHTYPE_UNSTRUCTURED
 
+VTK_LINE = 3
 
-def dp(*args, **kwargs):
+x = np.linspace(-5., 4., 10)
+y = np.linspace(0., 10., x.size)
+z = np.linspace(-20., -10., x.size)
+
+# Cells in VTK layout: a line between every pair of neighbouring nodes.
+types = np.full(x.size-1, VTK_LINE, dtype=np.uint8)
+offsets = np.arange(0, 2*x.size-1, 2)
+connectivity = np.column_stack((np.arange(x.size-1), np.arange(1, x.size))).ravel()
 
-    x = np.linspace(-5., 4., 10)
-    y = np.linspace(0., 10., x.size)
-    z = np.linspace(-20., -10., x.size)
-    c = np.zeros(3*(x.size-1), dtype=np.int32)
 
-    for i in range(c.size//3):
-        c[3*i] = VISIT_CELL_BEAM
-        c[3*i+1] = i
-        c[3*i+2] = i+1
+def dp(*args, **kwargs):
 
-    return x, y, c, c.size, z
+    # Returning the same topology arrays every cycle, the libsim connectivity is only built once.
+    return x, y, z, types, offsets, connectivity
 
 
 def main():
@@ -32,7 +34,7 @@ def main():
 
     mesh_name = 'example_u3'
     mesh_type = VISIT_MESHTYPE_UNSTRUCTURED
-    v.register_mesh(mesh_name, dp, mesh_type, 3, xunits="cm", yunits="cm", xlabel="a", ylabel="b", zunits="cm", zlabel="c")
+    v.register_mesh(mesh_name, dp, mesh_type, 3, vtk_cells=True, xunits="cm", yunits="cm", xlabel="a", ylabel="b", zunits="cm", zlabel="c")
     v.run()
 
 
@@ -4,10 +4,19 @@ from __future__ import division
 
 import logging
 
+import sys
+
+from . import libsim
 from .serial import VisitInstrumentation
 from .parallel import ParallelVisitInstrumentation
 
-from simV2 import *
+# The simV2 names (VISIT_*, VisIt*) are available as soon as simV2 is loaded, which happens
+# on first access or when an instrumentation is created. Before Python 3.7 it is loaded here.
+libsim.bind(globals())
+__getattr__ = libsim.getattr_hook(__name__)
+
+if sys.version_info < (3, 7):
+    libsim.load()
 
 
 __author__ = "Christoph Statz"
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+from . import libsim
+
+__author__ = 'Christoph Statz'
+
+libsim.bind(globals())
+__getattr__ = libsim.getattr_hook(__name__)
+
+
+def option_suffix(value):
+    """Suffix of the VisItSet{Plot,Operator}Options* function matching the type of value."""
+
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return option_suffix(value[0]) + 'v'
+
+    if isinstance(value, (bool, int, np.integer)):
+        return 'I'
+
+    if isinstance(value, (float, np.floating)):
+        return 'D'
+
+    return 'S'
+
+
+def set_options(prefix, ids, options):
+    """Sets options via the libsim function prefix + suffix, ids are the leading plot (and operator) ids."""
+
+    for name, value in options.items():
+        suffix = option_suffix(value)
+        args = ids + (name, )
+        if suffix.endswith('v'):
+            args += (list(value), len(value))
+        else:
+            args += (value, )
+        globals()[prefix + suffix](*args)
+
+
+class BatchPipeline(object):
+    """
+    Declarative description of the plots rendered and saved in batch mode.
+
+    plots is a sequence of dicts, e.g.
+
+        {'type': 'Pseudocolor', 'variable': 'd', 'options': {'colorTableName': 'hot'},
+         'operators': [{'type': 'Slice', 'all': False, 'options': {'originType': 0}}]}
+
+    Options are set with the VisItSetPlotOptions*/VisItSetOperatorOptions* function
+    matching the type of the value. An image is saved every every cycles, filename
+    is formatted with name and cycle.
+    """
+
+    def __init__(self, plots, every=1, filename='%(name)s_%(cycle)06d.png', width=1024, height=1024, image_format=None):
+
+        self.plots = list(plots)
+        self.every = max(1, int(every))
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.image_format = image_format
+        self.ready = False
+
+    def due(self, cycle):
+        return cycle % self.every == 0
+
+    def setup(self):
+        """Adds all plots and operators once, the pipeline is re-executed by VisItUpdatePlots afterwards."""
+
+        for pid, plot in enumerate(self.plots):
+
+            if VisItAddPlot(plot['type'], plot['variable']) != VISIT_OKAY:
+                raise ValueError('Adding %s plot of %s failed!' % (plot['type'], plot['variable']))
+
+            set_options('VisItSetPlotOptions', (pid, ), plot.get('options', dict()))
+
+            for oid, operator in enumerate(plot.get('operators', ())):
+
+                if VisItAddOperator(operator['type'], int(operator.get('all', False))) != VISIT_OKAY:
+                    raise ValueError('Adding %s operator to %s plot failed!' % (operator['type'], plot['type']))
+
+                set_options('VisItSetOperatorOptions', (pid, oid), operator.get('options', dict()))
+
+        VisItDrawPlots()
+        self.ready = True
+
+    def save(self, name, cycle):
+
+        image_format = self.image_format
+        if image_format is None:
+            image_format = VISIT_IMAGEFORMAT_PNG
+
+        filename = self.filename % dict(name=name, cycle=cycle)
+
+        return filename, VisItSaveWindow(filename, self.width, self.height, image_format) == VISIT_OKAY
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+from .helper import get_dtype_size_owner
+
+__author__ = 'Christoph Statz'
+
+
+# Memory layouts libsimV2 accepts for VisIt_VariableData_setData{I,F,D}.
+VISIT_DTYPES = {'I': np.dtype(np.int32), 'F': np.dtype(np.float32), 'D': np.dtype(np.float64)}
+
+
+class BufferPool(object):
+    """
+    Hands numpy arrays over to libsim without copying whenever possible.
+
+    C-contiguous arrays of a dtype libsim understands are passed as they are.
+    Everything else (strided views, int64, ...) is copied into a scratch
+    buffer taken from a pool, so repeated requests of the same size do not
+    allocate. With VISIT_OWNER_SIM, VisIt only references the memory, the
+    engine may keep it in its cache until the next time step change. Every
+    array handed out is therefore pinned to the generation (cycle) it was
+    requested in and released one generation after VisIt was told about a
+    new time step. Pins are grouped by request (e.g. kind, name and domain of
+    a callback) and only the last generations requests of the same key are
+    kept, so repeated requests while the time step does not change (a halted
+    simulation, skipped plot updates) do not pin more and more memory.
+    """
+
+    def __init__(self, generations=2):
+
+        self.generations = generations
+        self.__generation = 0
+        self.__requests = dict()
+        self.__pins = None
+        self.__scratch = dict()
+
+    def __acquire(self, size, dtype):
+
+        try:
+            buf = self.__scratch[(dtype.str, size)].pop()
+        except (KeyError, IndexError):
+            buf = np.empty(size, dtype=dtype)
+
+        return buf
+
+    def prepare(self, data, dtype):
+        """
+        Returns a flat, C-contiguous array of dtype sharing memory with data if possible.
+        The second return value is True if data had to be copied into a scratch buffer.
+        """
+
+        dtype = np.dtype(dtype)
+
+        if data.dtype == dtype and data.flags['C_CONTIGUOUS']:
+            return data.reshape(-1), False
+
+        buf = self.__acquire(data.size, dtype)
+        np.copyto(buf.reshape(data.shape), data, casting='unsafe')
+
+        return buf, True
+
+    def interleave(self, components, dtype):
+        """
+        Copies k component arrays of equal size into one flat scratch buffer of dtype,
+        the component index varying fastest as libsim expects for nComps=k.
+        """
+
+        dtype = np.dtype(dtype)
+        k = len(components)
+
+        buf = self.__acquire(components[0].size * k, dtype)
+        view = buf.reshape(-1, k)
+        for i, component in enumerate(components):
+            np.copyto(view[:, i], component.reshape(-1), casting='unsafe')
+
+        return buf
+
+    def request(self, key):
+        """Pins up to the next call belong to a new request of key, the oldest request of key is released if there are too many."""
+
+        requests = self.__requests.setdefault(key, list())
+        if len(requests) >= self.generations:
+            self.__release(requests.pop(0)[1])
+
+        self.__pins = list()
+        requests.append((self.__generation, self.__pins))
+
+    def pin(self, handle, data, scratch=False):
+        """Keep data alive until the generation or the request of handle is released."""
+
+        if self.__pins is None:
+            self.request(None)
+
+        self.__pins.append((handle, data, scratch))
+
+    def advance(self):
+        """Start a new generation and release the requests of the oldest one."""
+
+        self.__generation += 1
+        oldest = self.__generation - self.generations + 1
+
+        for requests in self.__requests.values():
+            while requests and requests[0][0] < oldest:
+                self.__release(requests.pop(0)[1])
+
+    def clear(self):
+        """Release every pinned array, e.g. after VisIt disconnected."""
+
+        for requests in self.__requests.values():
+            for generation, pins in requests:
+                self.__release(pins)
+
+        self.__requests = dict()
+        self.__pins = None
+
+    def __release(self, pins):
+
+        for handle, data, scratch in pins:
+            if scratch:
+                self.__scratch.setdefault((data.dtype.str, data.size), list()).append(data)
+
+    @property
+    def pinned(self):
+        return sum(len(pins) for requests in self.__requests.values() for generation, pins in requests)
+
+
+def freeze(data):
+    """
+    Converts the arrays returned by a data provider once into the layout libsim expects,
+    so that later requests can be handed over without any conversion.
+    """
+
+    if isinstance(data, tuple):
+        return tuple(freeze(d) if isinstance(d, np.ndarray) else d for d in data)
+
+    if isinstance(data, np.ndarray):
+        dtype = get_dtype_size_owner(data, None, None)[0]
+        if dtype is not None:
+            return np.ascontiguousarray(data, dtype=VISIT_DTYPES[dtype])
+
+    return data
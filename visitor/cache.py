@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .source import is_file_backed
+
+__author__ = 'Christoph Statz'
+
+
+def get_nbytes(data):
+    """Bytes held in memory by data, memory mapped files do not count."""
+
+    if isinstance(data, np.ndarray):
+        return 0 if is_file_backed(data) else data.nbytes
+
+    if isinstance(data, (tuple, list)):
+        return sum(get_nbytes(d) for d in data)
+
+    return 0
+
+
+class ProviderCache(object):
+    """
+    Memoizes data provider results per (kind, name, domain, cycle).
+
+    VisIt may request the same mesh or variable several times per update
+    (e.g. one Pseudocolor and one Contour plot on the same mesh). With the
+    cache, every provider runs at most once per cycle. Entries are evicted
+    in least recently used order as soon as budget (bytes) is exceeded.
+    """
+
+    def __init__(self, budget):
+
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key, dp):
+
+        try:
+            value, nbytes = self.__entries.pop(key)
+            self.__entries[key] = (value, nbytes)
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+
+        self.misses += 1
+        value = dp()
+        nbytes = get_nbytes(value)
+
+        if nbytes > self.budget:
+            return value
+
+        while self.nbytes + nbytes > self.budget and len(self.__entries) > 0:
+            self.__evict()
+
+        self.__entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+
+        return value
+
+    def __evict(self):
+
+        key, (value, nbytes) = self.__entries.popitem(last=False)
+        self.nbytes -= nbytes
+
+    def invalidate(self):
+
+        self.__entries.clear()
+        self.nbytes = 0
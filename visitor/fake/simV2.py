@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Pure Python stand-in for VisIt's simV2 module.
+
+Put the directory containing this file in front of sys.path to run the
+instrumentation without VisIt. Every handle is a plain integer indexing
+objects, which record the setter calls made on them. Data handed over via
+VisIt_VariableData_setData* is kept together with its owner flag and the
+address of its buffer, so callers can check whether data was copied.
+
+The engine side is driven with the request_* functions, which invoke the
+registered callbacks like VisIt would and free the returned handles.
+"""
+
+from __future__ import division
+
+import itertools
+
+__author__ = 'Christoph Statz'
+
+
+VISIT_INVALID_HANDLE = -1
+VISIT_ERROR = 0
+VISIT_OKAY = 1
+VISIT_NODATA = 2
+
+VISIT_OWNER_SIM = 0
+VISIT_OWNER_VISIT = 1
+VISIT_OWNER_COPY = 2
+VISIT_OWNER_VISIT_EX = 3
+
+VISIT_SIMMODE_UNKNOWN = 0
+VISIT_SIMMODE_RUNNING = 1
+VISIT_SIMMODE_STOPPED = 2
+
+VISIT_MESHTYPE_UNKNOWN = 0
+VISIT_MESHTYPE_RECTILINEAR = 1
+VISIT_MESHTYPE_CURVILINEAR = 2
+VISIT_MESHTYPE_UNSTRUCTURED = 3
+VISIT_MESHTYPE_POINT = 4
+VISIT_MESHTYPE_CSG = 5
+VISIT_MESHTYPE_AMR = 6
+
+VISIT_VARCENTERING_NODE = 0
+VISIT_VARCENTERING_ZONE = 1
+
+VISIT_VARTYPE_UNKNOWN = 0
+VISIT_VARTYPE_SCALAR = 1
+VISIT_VARTYPE_VECTOR = 2
+VISIT_VARTYPE_TENSOR = 3
+VISIT_VARTYPE_SYMMETRIC_TENSOR = 4
+VISIT_VARTYPE_MATERIAL = 5
+VISIT_VARTYPE_MATSPECIES = 6
+VISIT_VARTYPE_LABEL = 7
+VISIT_VARTYPE_ARRAY = 8
+VISIT_VARTYPE_MESH = 9
+VISIT_VARTYPE_CURVE = 10
+
+VISIT_DATATYPE_CHAR = 0
+VISIT_DATATYPE_INT = 1
+VISIT_DATATYPE_FLOAT = 2
+VISIT_DATATYPE_DOUBLE = 3
+VISIT_DATATYPE_LONG = 4
+
+VISIT_CELL_BEAM = 0
+VISIT_CELL_TRI = 1
+VISIT_CELL_QUAD = 2
+VISIT_CELL_TET = 3
+VISIT_CELL_PYR = 4
+VISIT_CELL_WEDGE = 5
+VISIT_CELL_HEX = 6
+VISIT_CELL_POINT = 7
+VISIT_CELL_POLYHEDRON = 8
+VISIT_CELL_QUADRATIC_EDGE = 20
+VISIT_CELL_QUADRATIC_TRI = 21
+VISIT_CELL_QUADRATIC_QUAD = 22
+VISIT_CELL_QUADRATIC_TET = 23
+VISIT_CELL_QUADRATIC_PYR = 24
+VISIT_CELL_QUADRATIC_WEDGE = 25
+VISIT_CELL_QUADRATIC_HEX = 26
+VISIT_CELL_BIQUADRATIC_TRI = 27
+VISIT_CELL_BIQUADRATIC_QUAD = 28
+VISIT_CELL_TRIQUADRATIC_HEX = 29
+VISIT_CELL_QUADRATIC_LINEAR_QUAD = 30
+VISIT_CELL_QUADRATIC_LINEAR_WEDGE = 31
+VISIT_CELL_BIQUADRATIC_QUADRATIC_WEDGE = 32
+VISIT_CELL_BIQUADRATIC_QUADRATIC_HEX = 33
+
+VISIT_IMAGEFORMAT_BMP = 0
+VISIT_IMAGEFORMAT_JPEG = 1
+VISIT_IMAGEFORMAT_PNG = 2
+VISIT_IMAGEFORMAT_POVRAY = 3
+VISIT_IMAGEFORMAT_PPM = 4
+VISIT_IMAGEFORMAT_RGB = 5
+VISIT_IMAGEFORMAT_TIFF = 6
+
+
+class State(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+
+        self.handles = itertools.count()
+        self.objects = dict()
+        self.callbacks = dict()
+        self.calls = list()
+        self.record_calls = False
+        self.input = list()
+        self.console = list()
+        self.memory = (0., 0.)
+        self.last_error = ''
+
+
+state = State()
+
+
+class Object(object):
+
+    __slots__ = ('kind', 'fields', 'children')
+
+    def __init__(self, kind):
+
+        self.kind = kind
+        self.fields = dict()
+        self.children = list()
+
+
+def _record(name, args):
+    if state.record_calls:
+        state.calls.append((name, args))
+
+
+def _alloc(kind):
+
+    def alloc():
+        _record('VisIt_%s_alloc' % kind, ())
+        h = next(state.handles)
+        state.objects[h] = Object(kind)
+        return h
+
+    return alloc
+
+
+# Setters taking handles, mapped to the number of leading arguments that are no handles.
+_HANDLE_SETTERS = {'setDomains': 1, 'setConnectivity': 1}
+_HANDLE_PREFIXES = ('add', 'setCoords', 'setRegions', 'setZonelist', 'setBoundary', 'setGhostCells', 'setDomains',
+                    'setConnectivity', 'setMaterials', 'setMixed', 'setSpecies')
+
+
+def _setter(kind, field):
+
+    skip = _HANDLE_SETTERS.get(field, 0)
+    takes_handles = field.startswith(_HANDLE_PREFIXES)
+
+    def setter(h, *args):
+
+        _record('VisIt_%s_%s' % (kind, field), args)
+
+        try:
+            obj = state.objects[h]
+        except KeyError:
+            return VISIT_ERROR
+
+        if obj.kind != kind:
+            return VISIT_ERROR
+
+        value = args[0] if len(args) == 1 else args
+        if field.startswith('add'):
+            obj.fields.setdefault(field, list()).append(value)
+        else:
+            obj.fields[field] = value
+        if takes_handles:
+            obj.children.extend(a for a in args[skip:] if isinstance(a, int) and a in state.objects)
+
+        return VISIT_OKAY
+
+    return setter
+
+
+def _set_data(dtype):
+
+    def set_data(h, owner, components, tuples, data):
+
+        _record('VisIt_VariableData_setData%s' % dtype, (owner, components, tuples))
+
+        try:
+            obj = state.objects[h]
+        except KeyError:
+            return VISIT_ERROR
+
+        try:
+            address = data.__array_interface__['data'][0]
+        except AttributeError:
+            address = None
+
+        obj.fields['data'] = dict(dtype=dtype, owner=owner, components=components, tuples=tuples, data=data, address=address)
+
+        return VISIT_OKAY
+
+    return set_data
+
+
+def _set_array_data(dtype):
+
+    def set_array_data(h, index, owner, tuples, offset, stride, data):
+
+        _record('VisIt_VariableData_setArrayData%s' % dtype, (index, owner, tuples, offset, stride))
+
+        try:
+            obj = state.objects[h]
+        except KeyError:
+            return VISIT_ERROR
+
+        try:
+            address = data.__array_interface__['data'][0]
+        except AttributeError:
+            address = None
+
+        arrays = obj.fields.setdefault('arrays', dict())
+        arrays[index] = dict(dtype=dtype, owner=owner, tuples=tuples, offset=offset, stride=stride, data=data, address=address)
+
+        return VISIT_OKAY
+
+    return set_array_data
+
+
+def free(h):
+    """Frees h and every handle set on it, like VisIt does with the handles returned by callbacks."""
+
+    obj = state.objects.pop(h, None)
+
+    if obj is not None:
+        for child in obj.children:
+            free(child)
+
+
+_OBJECTS = {
+    'SimulationMetaData': ('setMode', 'setCycleTime', 'addMesh', 'addVariable', 'addCurve', 'addExpression',
+                           'addMaterial', 'addSpecies', 'addGenericCommand', 'addCustomCommand'),
+    'MeshMetaData': ('setName', 'setMeshType', 'setTopologicalDimension', 'setSpatialDimension', 'setNumDomains',
+                     'setDomainTitle', 'setDomainPieceName', 'setNumGroups', 'setXUnits', 'setYUnits', 'setZUnits',
+                     'setXLabel', 'setYLabel', 'setZLabel'),
+    'VariableMetaData': ('setName', 'setMeshName', 'setType', 'setCentering', 'setUnits'),
+    'CurveMetaData': ('setName', 'setXLabel', 'setXUnits', 'setYLabel', 'setYUnits'),
+    'ExpressionMetaData': ('setName', 'setDefinition', 'setType'),
+    'CommandMetaData': ('setName', ),
+    'MaterialMetaData': ('setName', 'setMeshName', 'addMaterialName'),
+    'SpeciesMetaData': ('setName', 'setMeshName', 'setMaterialName', 'addSpeciesName'),
+    'NameList': ('addName', ),
+    'MaterialData': ('appendCells', 'setDimensions', 'addMaterial', 'addCleanCell', 'addMixedCell', 'setMaterials',
+                     'setMixedMaterials'),
+    'SpeciesData': ('addSpeciesName', 'setSpecies', 'setSpeciesMF', 'setMixedSpecies'),
+    'VariableData': (),
+    'DomainList': ('setDomains', ),
+    'CurveData': ('setCoordsXY', ),
+    'RectilinearMesh': ('setCoordsXY', 'setCoordsXYZ', 'setRealIndices', 'setBaseIndex', 'setGhostCells'),
+    'CurvilinearMesh': ('setCoordsXY', 'setCoordsXYZ', 'setCoords2', 'setCoords3', 'setRealIndices', 'setBaseIndex',
+                        'setGhostCells'),
+    'PointMesh': ('setCoordsXY', 'setCoordsXYZ', 'setCoords'),
+    'UnstructuredMesh': ('setCoordsXY', 'setCoordsXYZ', 'setCoords', 'setConnectivity', 'setRealIndices',
+                         'setGhostCells'),
+    'CSGMesh': ('setExtents', 'setBoundaryTypes', 'setBoundaryCoeffs', 'setRegions', 'setZonelist'),
+}
+
+for _kind, _fields in _OBJECTS.items():
+    globals()['VisIt_%s_alloc' % _kind] = _alloc(_kind)
+    for _field in _fields:
+        globals()['VisIt_%s_%s' % (_kind, _field)] = _setter(_kind, _field)
+
+for _dtype in ('C', 'I', 'L', 'F', 'D'):
+    globals()['VisIt_VariableData_setData%s' % _dtype] = _set_data(_dtype)
+    globals()['VisIt_VariableData_setArrayData%s' % _dtype] = _set_array_data(_dtype)
+
+
+def _callback(name):
+
+    def register(func, *args):
+        _record(name, args)
+        state.callbacks[name] = func
+        return VISIT_OKAY
+
+    return register
+
+
+for _name in ('VisItSetCommandCallback', 'VisItSetGetMetaData', 'VisItSetGetMesh', 'VisItSetGetVariable',
+              'VisItSetGetCurve', 'VisItSetGetDomainList', 'VisItSetGetMaterial', 'VisItSetGetSpecies', 'VisItSetSlaveProcessCallback',
+              'VisItSetBroadcastIntFunction', 'VisItSetBroadcastStringFunction'):
+    globals()[_name] = _callback(_name)
+
+
+def _control(name, result=VISIT_OKAY):
+
+    def control(*args):
+        _record(name, args)
+        return result
+
+    return control
+
+
+for _name in ('VisItSetDirectory', 'VisItSetupEnvironment', 'VisItSetupEnvironment2', 'VisItOpenTraceFile',
+              'VisItCloseTraceFile', 'VisItSetParallel', 'VisItSetParallelRank', 'VisItSetMPICommunicator',
+              'VisItAttemptToCompleteConnection', 'VisItProcessEngineCommand',
+              'VisItTimeStepChanged', 'VisItUpdatePlots', 'VisItSynchronize', 'VisItDisconnect',
+              'VisItInitializeRuntime', 'VisItAddPlot', 'VisItAddOperator', 'VisItDrawPlots', 'VisItDeleteActivePlots',
+              'VisItSaveWindow', 'VisItUI_setValueI', 'VisItUI_setValueS', 'VisItUI_valueChanged',
+              'VisItUI_stateChanged'):
+    globals()[_name] = _control(_name)
+
+for _suffix in ('C', 'UC', 'I', 'L', 'F', 'D', 'S', 'Cv', 'UCv', 'Iv', 'Lv', 'Fv', 'Dv', 'Sv'):
+    globals()['VisItSetPlotOptions' + _suffix] = _control('VisItSetPlotOptions' + _suffix)
+    globals()['VisItSetOperatorOptions' + _suffix] = _control('VisItSetOperatorOptions' + _suffix)
+
+
+def VisItInitializeSocketAndDumpSimFile(name, comment, path, input_file, gui_file, absolute_filename):
+    """Writes an empty sim file to absolute_filename, like libsim it is removed by the caller."""
+
+    _record('VisItInitializeSocketAndDumpSimFile', (name, comment, path, input_file, gui_file, absolute_filename))
+
+    with open(absolute_filename, 'w'):
+        pass
+
+    return VISIT_OKAY
+
+
+def VisItGetEnvironment():
+    return ''
+
+
+def VisItGetListenSocket():
+    return -1
+
+
+def VisItGetEngineSocket():
+    return -1
+
+
+def VisItGetMemory():
+    return state.memory
+
+
+def VisItGetLastError():
+    return state.last_error
+
+
+def VisItDetectInput(blocking, console):
+    return VisItDetectInputWithTimeout(blocking, 0, console)
+
+
+def VisItDetectInputWithTimeout(blocking, timeout, console):
+    """Returns the next state queued in state.input, 0 (nothing happened) if there is none."""
+
+    _record('VisItDetectInputWithTimeout', (blocking, timeout, console))
+
+    if len(state.input) > 0:
+        return state.input.pop(0)
+
+    return 0
+
+
+def VisItReadConsole():
+
+    if len(state.console) > 0:
+        return state.console.pop(0)
+
+    return ''
+
+
+def _request(callback, *args):
+
+    h = state.callbacks[callback](*args)
+    obj = state.objects.get(h)
+    free(h)
+
+    return h, obj
+
+
+def request_metadata():
+    return _request('VisItSetGetMetaData', None)
+
+
+def request_mesh(name, domain):
+    return _request('VisItSetGetMesh', domain, name, None)
+
+
+def request_variable(name, domain):
+    return _request('VisItSetGetVariable', domain, name, None)
+
+
+def request_curve(name):
+    return _request('VisItSetGetCurve', name, None)
+
+
+def request_material(name, domain):
+    return _request('VisItSetGetMaterial', domain, name, None)
+
+
+def request_species(name, domain):
+    return _request('VisItSetGetSpecies', domain, name, None)
+
+
+def request_domain_list(name):
+    return _request('VisItSetGetDomainList', name, None)
+
+
+def command(name, arguments=''):
+    return state.callbacks['VisItSetCommandCallback'](name, arguments, None)
+
+
+__all__ = [_name for _name in globals() if _name.startswith(('VisIt', 'VISIT_'))]
@@ -2,11 +2,18 @@
 
 from __future__ import division
 
+import os
+import json
 import subprocess
 import numpy as np
 
 from enum import Enum
 
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
 __author__ = 'Christoph Statz'
 
 
@@ -48,7 +55,7 @@ def get_visit_dirs():
     except OSError:
         raise OSError("Path to visit executable is not set!")
 
-    out = p.communicate()[0].split('\n')
+    out = p.communicate()[0].decode().split('\n')
 
     for line in out:
         tmp = line.strip().split('=')
@@ -60,6 +67,56 @@ def get_visit_dirs():
     return lib_path, visit_home
 
 
+def get_cache_file():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'visitor', 'visit_dirs.json')
+
+
+def find_visit_dirs():
+    """
+    Returns (lib_path, visit_home) of the VisIt installation.
+
+    VISITOR_LIBPATH (and optionally VISITOR_HOME) override the discovery. Otherwise the
+    result of `visit -env` is cached in get_cache_file(), keyed by path and modification
+    time of the visit executable in PATH, so VisIt is only run after it changed.
+    """
+
+    if os.environ.get('VISITOR_LIBPATH'):
+        return os.environ['VISITOR_LIBPATH'], os.environ.get('VISITOR_HOME')
+
+    executable = which('visit')
+    if executable is None:
+        raise OSError("Path to visit executable is not set!")
+
+    executable = os.path.realpath(executable)
+    mtime = os.path.getmtime(executable)
+    cache_file = get_cache_file()
+
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        cache = dict()
+
+    entry = cache.get(executable)
+    if entry is not None and entry['mtime'] == mtime:
+        return entry['lib_path'], entry['visit_home']
+
+    lib_path, visit_home = get_visit_dirs()
+    cache[executable] = dict(mtime=mtime, lib_path=lib_path, visit_home=visit_home)
+
+    # A missing or read-only cache only costs another `visit -env` next time.
+    try:
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file))
+        with open(cache_file + '.%d' % os.getpid(), 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.rename(cache_file + '.%d' % os.getpid(), cache_file)
+    except (IOError, OSError):
+        pass
+
+    return lib_path, visit_home
+
+
 class S(Enum):
     """
     VisItDetectInput return codes as described in
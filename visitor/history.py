@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+__author__ = 'Christoph Statz'
+
+
+class History(object):
+    """
+    Time history curve of at most capacity points backed by preallocated numpy arrays.
+
+    append() is O(1) and never allocates, the oldest point is dropped once capacity is
+    reached. Every point is written twice, at i and i + capacity, so the last capacity
+    points are always one contiguous slice and calling the history (it is a curve data
+    provider) returns views handed to VisIt without copying. With max_points, longer
+    histories are served with every k-th point only (always including the newest one).
+    """
+
+    def __init__(self, capacity, max_points=None, dtype=np.float64):
+
+        if capacity < 1:
+            raise ValueError('History capacity must be positive, got %d!' % capacity)
+
+        if max_points is not None and max_points < 2:
+            raise ValueError('History max_points must be at least 2, got %d!' % max_points)
+
+        self.capacity = capacity
+        self.max_points = max_points
+        self.__x = np.zeros(2 * capacity, dtype=dtype)
+        self.__y = np.zeros(2 * capacity, dtype=dtype)
+        self.__count = 0
+
+    def __len__(self):
+        return min(self.__count, self.capacity)
+
+    def append(self, x, y):
+
+        i = self.__count % self.capacity
+
+        self.__x[i] = self.__x[i + self.capacity] = x
+        self.__y[i] = self.__y[i + self.capacity] = y
+        self.__count += 1
+
+    def clear(self):
+        self.__count = 0
+
+    def window(self):
+        """Views of the x and y values held, oldest first."""
+
+        n = len(self)
+        start = self.__count % self.capacity if self.__count > self.capacity else 0
+
+        return self.__x[start:start + n], self.__y[start:start + n]
+
+    def __call__(self, *args, **kwargs):
+
+        x, y = self.window()
+        n = len(x)
+
+        if self.max_points is None or n <= self.max_points:
+            return x, y
+
+        stride = -(-n // self.max_points)
+        first = (n - 1) % stride
+
+        return x[first::stride], y[first::stride]
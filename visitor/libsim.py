@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy import of VisIt's simV2 module.
+
+Nothing is discovered or imported before load() is called, so importing visitor
+starts no process. The names of simV2 are copied into every namespace passed to
+bind(), modules use them like after 'from simV2 import *'.
+"""
+
+from __future__ import division
+
+import sys
+
+from .helper import find_visit_dirs
+
+__author__ = 'Christoph Statz'
+
+
+simV2 = None
+lib_path = None
+visit_home = None
+
+_namespaces = list()
+
+
+def names():
+    return [name for name in dir(simV2) if name.startswith(('VisIt', 'VISIT_'))]
+
+
+def bind(namespace):
+    """Copies the simV2 names into namespace (a module's globals()) as soon as simV2 is loaded."""
+
+    _namespaces.append(namespace)
+
+    if simV2 is not None:
+        namespace.update((name, getattr(simV2, name)) for name in names())
+
+
+def load(dirs=None):
+    """
+    Imports simV2 once and returns it. dirs is (lib_path, visit_home) as returned by
+    helper.find_visit_dirs; without dirs, VisIt is only discovered if simV2 is not
+    importable already (e.g. VisIt's lib path is in PYTHONPATH or visitor/fake is used).
+    A lib_path of None imports simV2 from sys.path as is.
+    """
+
+    global simV2, lib_path, visit_home
+
+    if simV2 is not None:
+        return simV2
+
+    if dirs is None:
+        try:
+            import simV2 as module
+            dirs = (None, None)
+        except ImportError:
+            dirs = find_visit_dirs()
+
+    lib_path, visit_home = dirs
+
+    # Append VisIt lib path to path before importing simV2
+    if lib_path is not None and lib_path not in sys.path:
+        sys.path.insert(1, lib_path)
+
+    import simV2 as module
+    sys.stdin.flush()
+
+    simV2 = module
+    for namespace in _namespaces:
+        namespace.update((name, getattr(simV2, name)) for name in names())
+
+    return simV2
+
+
+def getattr_hook(module_name):
+    """Module level __getattr__ (Python >= 3.7) loading simV2 on first access of one of its names."""
+
+    def __getattr__(name):
+
+        if name.startswith(('VisIt', 'VISIT_')):
+            return getattr(load(), name)
+
+        raise AttributeError("module %r has no attribute %r" % (module_name, name))
+
+    return __getattr__
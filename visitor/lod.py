@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numbers
+
+import numpy as np
+
+__author__ = 'Christoph Statz'
+
+
+# Strides selectable as preview level of detail.
+LOD_STRIDES = (1, 2, 4, 8)
+
+
+def node_indices(n, stride):
+    """
+    Indices of the nodes kept along an axis of n nodes. The last node is always kept,
+    so the decimated mesh covers the same extent and coarse zone k starts at fine zone k*stride.
+    """
+
+    idx = np.arange(0, n, stride)
+    if idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+
+    return idx
+
+
+def ghost_widths(ghost, ndim):
+    """Normalizes ghost zone layers given as int, one int per axis or (low, high) per axis to ((low, high), ...)."""
+
+    if isinstance(ghost, numbers.Integral):
+        ghost = (ghost, ) * ndim
+
+    if len(ghost) != ndim:
+        raise ValueError('Expected ghost zone layers for %d axes, got %s!' % (ndim, str(ghost)))
+
+    return tuple((int(g), int(g)) if isinstance(g, numbers.Integral) else (int(g[0]), int(g[1])) for g in ghost)
+
+
+def real_indices(dims, ghost, stride=1):
+    """
+    First and last real node index per axis of a structured mesh of dims (nx, ny, ...) nodes
+    with ghost (as returned by ghost_widths) zone layers, after decimation by stride.
+    If stride exceeds the real extent of an axis, at least one coarse zone stays real.
+    """
+
+    low = list()
+    high = list()
+
+    for n, (g_low, g_high) in zip(dims, ghost):
+        idx = node_indices(n, stride)
+        l = int(np.searchsorted(idx, g_low, 'left'))
+        h = int(np.searchsorted(idx, n - 1 - g_high, 'right')) - 1
+
+        if h - l < 1 and len(idx) > 1:
+            h = min(l + 1, len(idx) - 1)
+            l = h - 1
+
+        low.append(l)
+        high.append(h)
+
+    return low, high
+
+
+def decimate_coordinates(x, stride):
+    """Decimates the 1d node coordinates of a rectilinear mesh axis."""
+    return x[node_indices(len(x), stride)]
+
+
+def decimate_nodes(data, dims, stride, components=1):
+    """
+    Decimates node centered data on a structured mesh of dims (nx, ny, ...) nodes, x varying fastest.
+    Multi-component data keeps its trailing axis of components.
+    """
+
+    shape = tuple(dims)[::-1]
+    indices = [node_indices(n, stride) for n in shape]
+
+    if components > 1:
+        return data.reshape(shape + (components, ))[np.ix_(*indices + [np.arange(components)])]
+
+    return data.reshape(shape)[np.ix_(*indices)]
+
+
+def decimate_zones(data, dims, stride, components=1):
+    """Decimates zone centered data on a structured mesh of dims (nx, ny, ...) nodes by sampling the first fine zone of every coarse zone."""
+
+    shape = tuple(n - 1 for n in dims)[::-1]
+    slices = tuple(slice(None, None, stride) for n in shape)
+
+    if components > 1:
+        return data.reshape(shape + (components, ))[slices]
+
+    return data.reshape(shape)[slices]
+
+
+def structured_dims(data, rectilinear, interleaved=False):
+    """Node dims (nx, ny, ...) of the rectilinear or curvilinear mesh described by the provider data, None if unknown."""
+
+    # Interleaved curvilinear coordinates of shape (..., ny, nx, ndim).
+    if interleaved:
+        return np.shape(data)[:-1][::-1]
+
+    coordinates = [c for c in data[:3] if c is not None]
+
+    if rectilinear:
+        return tuple(len(c) for c in coordinates)
+
+    shape = np.shape(coordinates[0])
+    if len(shape) > 1:
+        return shape[::-1]
+
+    return None
+
+
+def decimate_mesh(data, dims, stride, rectilinear, interleaved=False):
+    """Decimates the coordinates returned by a rectilinear or curvilinear mesh provider, remaining arguments are kept."""
+
+    n = len(dims)
+
+    if interleaved:
+        data = np.asarray(data)
+        return decimate_nodes(data, dims, stride, data.shape[-1])
+
+    if rectilinear:
+        coordinates = tuple(decimate_coordinates(np.asarray(c), stride) for c in data[:n])
+    else:
+        coordinates = tuple(decimate_nodes(np.asarray(c), dims, stride) for c in data[:n])
+
+    return coordinates + tuple(data[n:])
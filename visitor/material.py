@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+__author__ = 'Christoph Statz'
+
+
+def mixed_material_lists(fractions):
+    """
+    Builds the material lists libsim (like Silo) expects from a (cells x materials) array of volume fractions.
+
+    Returns matlist, holding the material number of every clean cell and -(1-based index of its
+    first mix entry) for every mixed cell, and mix_mat, mix_zone, mix_vf, mix_next describing
+    the materials of the mixed cells. mix_next is the 1-based index of the next entry of the
+    same cell, 0 ends the cell. None is returned for the mix arrays if every cell is clean.
+    """
+
+    fractions = np.asarray(fractions)
+    fractions = fractions.reshape(-1, fractions.shape[-1])
+
+    present = fractions > 0
+    mixed = np.count_nonzero(present, axis=1) > 1
+
+    matlist = np.argmax(fractions, axis=1).astype(np.int32)
+
+    if not mixed.any():
+        return matlist, None
+
+    # Row major order groups the entries by cell.
+    cells, materials = np.nonzero(present & mixed[:, None])
+    n = len(cells)
+
+    first = np.empty(n, dtype=bool)
+    first[0] = True
+    np.not_equal(cells[1:], cells[:-1], out=first[1:])
+
+    mix_next = np.arange(2, n + 2, dtype=np.int32)
+    mix_next[np.flatnonzero(first)[1:] - 1] = 0
+    mix_next[-1] = 0
+
+    matlist[cells[first]] = -(np.flatnonzero(first) + 1)
+
+    mix_mat = materials.astype(np.int32)
+    mix_zone = cells.astype(np.int32)
+    mix_vf = fractions[cells, materials]
+
+    return matlist, (mix_mat, mix_zone, mix_vf, mix_next)
+
+
+def material_lists(data, number_of_materials):
+    """
+    Material lists of the data returned by a material provider: an integer array of per cell
+    material numbers (clean cells only, handed over as is) or an array of volume fractions
+    with the materials along its last axis.
+    """
+
+    data = np.asarray(data)
+
+    if data.dtype.kind in 'iu':
+        return data.reshape(-1), None
+
+    if data.shape[-1] != number_of_materials:
+        raise ValueError('Expected volume fractions of %d materials, got shape %s!' % (number_of_materials, str(data.shape)))
+
+    return mixed_material_lists(data)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import os
+import json
+import time
+import bisect
+
+__author__ = 'Christoph Statz'
+
+
+# Upper bounds (seconds) of the histogram buckets, an overflow bucket is implicit.
+BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1., 10.)
+
+
+class Histogram(object):
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self, n):
+
+        self.counts = [0] * (n + 1)
+        self.count = 0
+        self.sum = 0.
+        self.max = 0.
+
+    def observe(self, value, buckets):
+
+        self.counts[bisect.bisect_left(buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+
+class Metrics(object):
+    """
+    Fixed bucket latency histograms per (timer, name, domain).
+
+    Timers used by the instrumentation are the callbacks (cb_metadata, cb_mesh,
+    cb_variable, cb_material, cb_species, cb_curve, cb_domain_list), the data
+    providers (provider_mesh, provider_variable, provider_material,
+    provider_species, provider_curve in threaded mode), the phases of a plot update (time_step_changed,
+    update_plots, synchronize) and the per cycle reductions (reductions).
+    """
+
+    def __init__(self, buckets=BUCKETS, clock=time.time):
+
+        self.buckets = tuple(buckets)
+        self.clock = clock
+        self.histograms = dict()
+
+    def observe(self, timer, value, name='', domain=-1):
+
+        key = (timer, name, domain)
+
+        try:
+            histogram = self.histograms[key]
+        except KeyError:
+            histogram = self.histograms[key] = Histogram(len(self.buckets))
+
+        histogram.observe(value, self.buckets)
+
+    def call(self, timer, name, domain, func, *args):
+
+        start = self.clock()
+        try:
+            return func(*args)
+        finally:
+            self.observe(timer, self.clock() - start, name, domain)
+
+    def wrap(self, timer, func, name_index=None, domain_index=None):
+        """Wraps a libsim callback, name and domain are taken from the positional arguments."""
+
+        def timed(*args):
+            start = self.clock()
+            try:
+                return func(*args)
+            finally:
+                name = args[name_index] if name_index is not None else ''
+                domain = args[domain_index] if domain_index is not None else -1
+                self.observe(timer, self.clock() - start, name, domain)
+
+        return timed
+
+    def reset(self):
+        self.histograms.clear()
+
+    def to_dict(self):
+
+        entries = list()
+
+        for (timer, name, domain), histogram in sorted(self.histograms.items()):
+            entries.append(dict(timer=timer, name=name, domain=domain, count=histogram.count, sum=histogram.sum,
+                                max=histogram.max, counts=list(histogram.counts)))
+
+        return dict(buckets=list(self.buckets), histograms=entries)
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix='visitor'):
+
+        metric = '%s_seconds' % prefix
+        lines = ['# HELP %s Latency of VisIt callbacks, data providers and plot updates.' % metric,
+                 '# TYPE %s histogram' % metric]
+
+        bounds = ['%g' % b for b in self.buckets] + ['+Inf']
+
+        for (timer, name, domain), histogram in sorted(self.histograms.items()):
+            labels = 'timer="%s",name="%s",domain="%d"' % (timer, name, domain)
+            cumulative = 0
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (metric, labels, bound, cumulative))
+            lines.append('%s_sum{%s} %.9g' % (metric, labels, histogram.sum))
+            lines.append('%s_count{%s} %d' % (metric, labels, histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filename):
+        """Writes the histograms as Prometheus textfile if filename ends with .prom, as JSON otherwise."""
+
+        if filename.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = self.to_json()
+
+        # Write and rename, so a node exporter never reads a partial file.
+        with open(filename + '.tmp', 'w') as f:
+            f.write(content)
+        os.rename(filename + '.tmp', filename)
+
+    def summary(self):
+
+        lines = list()
+
+        for (timer, name, domain), histogram in sorted(self.histograms.items(), key=lambda item: -item[1].sum):
+            lines.append('%-18s %-24s %6d: n=%d, mean=%.3g s, max=%.3g s, total=%.3g s' % (
+                timer, name, domain, histogram.count, histogram.sum / max(1, histogram.count), histogram.max, histogram.sum))
+
+        return '\n'.join(lines)
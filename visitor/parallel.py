@@ -3,32 +3,75 @@
 from __future__ import division
 
 import sys
+import time
 import logging
+import numpy as np
 from distutils.version import LooseVersion
 
-from .helper import get_visit_dirs
+from . import libsim
 from .serial import VisitInstrumentation
-from simV2 import *
+from .reduction import combine
 
 
 __author__ = 'Christoph Statz'
 
+libsim.bind(globals())
+__getattr__ = libsim.getattr_hook(__name__)
+
 
 VISIT_COMMAND_PROCESS = 0
 VISIT_COMMAND_SUCCESS = 1
 VISIT_COMMAND_FAILURE = 2
 
+# Longest sleep (seconds) between tests of a pending control broadcast on the waiting ranks.
+IDLE_SLEEP = 0.01
+
 
 class ParallelVisitInstrumentation(VisitInstrumentation):
 
-    def __init__(self, name, description, prefix=None, step=None, cycle_time_provider=None, trace=False, ui=None, input=None):
+    def __init__(self, name, description, prefix=None, step=None, cycle_time_provider=None, trace=False, ui=None, input=None, cache_budget=None, poll_steps=None, poll_interval=None, update_cycles=1, update_fraction=None, update_interval=None, comm=None, metrics_file=None, record_file=None):
+        """
+        comm is the communicator of the ranks that serve data to VisIt (default: MPI.COMM_WORLD).
+        Only these ranks construct the instrumentation, all other ranks are never involved.
+        """
 
         import mpi4py.MPI as MPI
         from mpi4py import __version__ as mpi4py_version
 
-        self.__comm = MPI.COMM_WORLD
-        self.__rank = MPI.COMM_WORLD.Get_rank()
-        self.__size = MPI.COMM_WORLD.Get_size()
+        if comm is None:
+            comm = MPI.COMM_WORLD
+
+        self.__comm = comm
+        self.__rank = comm.Get_rank()
+        self.__size = comm.Get_size()
+
+        # Only rank 0 discovers VisIt (or fails to), all other ranks import simV2 from the broadcast lib path.
+        dirs = None
+        if self.__rank == 0:
+            try:
+                libsim.load()
+                dirs = (libsim.lib_path, libsim.visit_home)
+            except (OSError, ImportError) as e:
+                dirs = e
+
+        dirs = comm.bcast(dirs, root=0)
+        if isinstance(dirs, Exception):
+            raise dirs
+        libsim.load(dirs)
+
+        # Preallocated buffer for the per-step control path, broadcast without pickling.
+        self.__control = np.zeros(2, dtype=np.int32)
+        self.__mpi = MPI
+
+        # Nonblocking collectives need MPI-3 and mpi4py >= 2.0.
+        self.__nonblocking = hasattr(comm, 'Ibcast')
+
+        self.__domain_map = dict()
+        self.__domain_map_dirty = True
+
+        self.__reduction_op = None
+        self.__reduction_type = None
+        self.__reduction_kinds = None
 
         VisItSetBroadcastIntFunction(self.__bcast_int)
         VisItSetBroadcastStringFunction(self.__bcast_string)
@@ -36,9 +79,15 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
         VisItSetParallelRank(self.__rank)
 
         if LooseVersion(mpi4py_version) > LooseVersion("2.0.0"):
-            # TODO: Pass MPI Communicator
-            #VisItSetMPICommunicator(MPI._addressof(MPI.COMM_WORLD))
-            pass
+            VisItSetMPICommunicator(MPI._addressof(self.__comm))
+        elif comm != MPI.COMM_WORLD:
+            raise ValueError('Passing a communicator to libsim requires mpi4py > 2.0.0!')
+
+        # Every rank keeps its own histograms and recording, e.g. metrics_file='metrics.%(rank)d.prom'.
+        if metrics_file is not None and '%(rank)' in metrics_file:
+            metrics_file = metrics_file % dict(rank=self.__rank)
+        if record_file is not None and '%(rank)' in record_file:
+            record_file = record_file % dict(rank=self.__rank)
 
         env = None
         if self.__rank == 0:
@@ -47,35 +96,84 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
         env = self.__comm.bcast(env, root=0)
         VisItSetupEnvironment2(env)
 
-        VisitInstrumentation.__init__(self, name, description, prefix=prefix, step=step, cycle_time_provider=cycle_time_provider, trace=trace, master=self.__rank==0, ui=ui, input=input, init_env=False)
+        VisitInstrumentation.__init__(self, name, description, prefix=prefix, step=step, cycle_time_provider=cycle_time_provider, trace=trace, master=self.__rank==0, ui=ui, input=input, init_env=False, cache_budget=cache_budget, poll_steps=poll_steps, poll_interval=poll_interval, update_cycles=update_cycles, update_fraction=update_fraction, update_interval=update_interval, metrics_file=metrics_file, record_file=record_file)
 
         self.logger = logging.getLogger(__name__)
 
-    def __bcast_int(self, data, sender):
+    def __bcast_control(self, values, root=0, idle=False):
+        """
+        Broadcasts len(values) integers from root, the values of all other ranks are ignored.
+        idle marks a broadcast following a blocking wait of root for input, it has to be the same on all ranks.
+        """
 
-        if self.__rank == sender:
-            return self.__comm.bcast(data)
+        buf = self.__control[:len(values)]
+
+        if self.__rank == root:
+            buf[:] = values
+
+        # While rank 0 blocks in VisItDetectInputWithTimeout, a blocking Bcast busy polls on all other
+        # ranks in most MPI implementations. The waiting ranks test a nonblocking one and sleep instead.
+        # On the hot path of a running simulation, the plain Bcast avoids oversleeping.
+        if not idle or not self.__nonblocking:
+            self.__comm.Bcast(buf, root=root)
+        elif self.__rank == root:
+            self.__comm.Ibcast(buf, root=root).Wait()
         else:
-            return self.__comm.bcast(None)
+            self.__wait(self.__comm.Ibcast(buf, root=root))
+
+        return buf.tolist()
+
+    def __wait(self, request):
+        """Waits for request with sleeps growing up to IDLE_SLEEP, an idle halted job uses no CPU."""
+
+        delay = 0.
+        while not request.Test():
+            time.sleep(delay)
+            delay = min(max(2 * delay, 1e-5), IDLE_SLEEP)
+
+    def __bcast_int(self, data, sender):
+        return self.__bcast_control((data, ), root=sender)[0]
 
     def __bcast_string(self, data, length, sender):
-        return self.__bcast_int(data, sender)
 
-    def get_input_from_visit(self):
+        if self.__rank == sender:
+            return self.__comm.bcast(data, root=sender)
+        else:
+            return self.__comm.bcast(None, root=sender)
+
+    def get_input_from_visit(self, blocking=False):
 
         if self.__rank == 0:
             console = sys.stdin.fileno()
-            s = VisItDetectInputWithTimeout(int(self.run_mode == VISIT_SIMMODE_STOPPED), self.timeout, console)
+            s = VisItDetectInputWithTimeout(int(blocking), self.timeout, console)
         else:
-            s = None
+            s = 0
 
-        s = self.__comm.bcast(s, root=0)
+        # The polling cadence is tuned from rank 0's step duration, so all ranks poll in the same step.
+        # blocking only depends on the run mode, which is the same on all ranks.
+        s, self.poll.every = self.__bcast_control((s, self.poll.every), idle=blocking)
 
         return s
 
+    def poll_due(self):
+
+        if self.poll.interval is None:
+            return self.poll.due()
+
+        # Wall time decisions differ between ranks, rank 0 decides for all.
+        return bool(self.__bcast_control((self.poll.due() if self.__rank == 0 else 0, ))[0])
+
+    def update_due(self):
+
+        if self.updates.deterministic:
+            return self.updates.due()
+
+        # Time based decisions differ between ranks, rank 0 decides for all.
+        return bool(self.__bcast_control((self.updates.due() if self.__rank == 0 else 0, ))[0])
+
     def __cb_slave_process(self):
         if self.__rank == 0:
-            self.__comm.bcast(VISIT_COMMAND_PROCESS, root=0)
+            self.__bcast_control((VISIT_COMMAND_PROCESS, ))
 
     def process_engine_command(self):
 
@@ -84,14 +182,14 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
             success = VisItProcessEngineCommand()
 
             if success == VISIT_OKAY:
-                self.__comm.bcast(VISIT_COMMAND_SUCCESS, root=0)
+                self.__bcast_control((VISIT_COMMAND_SUCCESS, ))
                 return
             else:
-                self.__comm.bcast(VISIT_COMMAND_FAILURE, root=0)
+                self.__bcast_control((VISIT_COMMAND_FAILURE, ))
 
         else:
             while True:
-                command = self.__comm.bcast(None, root=0)
+                command = self.__bcast_control((0, ))[0]
                 if command == VISIT_COMMAND_PROCESS:
                     VisItProcessEngineCommand()
                 elif command == VISIT_COMMAND_SUCCESS:
@@ -102,6 +200,7 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
         VisItDisconnect()
         self.run_mode = VISIT_SIMMODE_RUNNING
         self.visit_is_connected = False
+        self.release_buffers()
         return
 
     def process_console_command(self):
@@ -119,14 +218,125 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
         except:
             pass
 
+    def combine_reductions(self, buf, kinds):
+        """
+        Combines the partial reduction results of all ranks with one Allreduce. The packed buffer is
+        a single element of a contiguous datatype, so the user defined operation always sees whole
+        buffers and can apply min, max or sum per entry. All ranks have to register the same reductions.
+        """
+
+        MPI = self.__mpi
+
+        if self.__reduction_type is None or self.__reduction_type[0] != len(buf):
+            if self.__reduction_type is not None:
+                self.__reduction_type[1].Free()
+            datatype = MPI.DOUBLE.Create_contiguous(len(buf))
+            datatype.Commit()
+            self.__reduction_type = (len(buf), datatype)
+
+        if self.__reduction_op is None:
+            self.__reduction_op = MPI.Op.Create(self.__combine, commute=True)
+
+        self.__reduction_kinds = kinds
+
+        result = np.empty_like(buf)
+        datatype = self.__reduction_type[1]
+        self.__comm.Allreduce([buf, 1, datatype], [result, 1, datatype], op=self.__reduction_op)
+
+        return result
+
+    def __combine(self, inbuf, inoutbuf, datatype):
+
+        a = np.frombuffer(inbuf, dtype=np.float64)
+        b = np.frombuffer(inoutbuf, dtype=np.float64)
+        b[:] = combine(a, b, self.__reduction_kinds)
+
     def connect_visit(self):
 
         VisitInstrumentation.connect_visit(self)
 
         if self.visit_is_connected:
             VisItSetSlaveProcessCallback(self.__cb_slave_process)
+            self.build_domain_map()
+
+    def update_plots(self):
+
+        buf = self.__control[:1]
+        buf[0] = self.__domain_map_dirty
+        self.__comm.Allreduce(self.__mpi.IN_PLACE, buf, op=self.__mpi.MAX)
+
+        if buf[0]:
+            self.build_domain_map()
+
+        VisitInstrumentation.update_plots(self)
+
+    def build_domain_map(self):
+        """
+        Collectively gathers which rank serves which domain of every registered mesh.
+        Raises a ValueError if the ranks disagree on the number of domains or a domain is served twice,
+        warns (on rank 0) about domains no rank serves, VisIt is told they exist but gets no data for them.
+        """
+
+        gathered = self.__comm.allgather(self.get_mesh_domains())
+
+        names = set()
+        for local in gathered:
+            names.update(local.keys())
+
+        domain_map = dict()
+
+        for name in names:
+
+            sizes = set(local[name][0] for local in gathered if name in local)
+            if len(sizes) != 1:
+                raise ValueError('Ranks disagree on the number of domains of mesh %s: %s' % (name, sorted(sizes)))
+
+            number_of_domains = sizes.pop()
+            owners = np.full(number_of_domains, -1, dtype=np.int32)
+
+            for rank, local in enumerate(gathered):
+                if name not in local:
+                    continue
+
+                domains = local[name][1]
+                if len(domains) > 0 and (domains[0] < 0 or domains[-1] >= number_of_domains):
+                    raise ValueError('Rank %d serves domains of mesh %s outside of [0, %d)!' % (rank, name, number_of_domains))
+
+                served = domains[owners[domains] >= 0]
+                if len(served) > 0:
+                    raise ValueError('Domains %s of mesh %s are served by more than one rank!' % (served.tolist(), name))
+
+                owners[domains] = rank
+
+            unserved = np.flatnonzero(owners < 0)
+            if len(unserved) > 0 and self.__rank == 0:
+                self.logger.warn('Domains %s of mesh %s (%d of %d) are not served by any rank!' % (unserved[:10].tolist(), name, len(unserved), number_of_domains))
 
-    def register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=None, number_of_domains=None, **kwargs):
+            local_domains = np.flatnonzero(owners == self.__rank).astype(np.int32)
+            domain_map[name] = (number_of_domains, owners, local_domains)
+
+        self.__domain_map = domain_map
+        self.__domain_map_dirty = False
+
+        self.logger.debug("Domain map built for %d meshes." % len(domain_map))
+
+    @property
+    def domain_map(self):
+        """dict of mesh name to an array holding the rank serving each domain (-1 if none)."""
+        return dict((name, entry[1]) for name, entry in self.__domain_map.items())
+
+    def domain_owner(self, name, domain):
+        return int(self.__domain_map[name][1][domain])
+
+    def get_domain_list(self, name):
+
+        if self.__domain_map_dirty or name not in self.__domain_map:
+            return VisitInstrumentation.get_domain_list(self, name)
+
+        number_of_domains, owners, domains = self.__domain_map[name]
+        return number_of_domains, domains
+
+    def register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=None, number_of_domains=None, static=False, ghost=None, vtk_cells=False, interleaved=False, **kwargs):
 
         if domain is None:
             domain = self.__rank
@@ -134,11 +344,26 @@ class ParallelVisitInstrumentation(VisitInstrumentation):
         if number_of_domains is None:
             number_of_domains = self.__size
 
-        VisitInstrumentation.register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=domain, number_of_domains=number_of_domains, **kwargs)
+        self.__domain_map_dirty = True
+        VisitInstrumentation.register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=domain, number_of_domains=number_of_domains, static=static, ghost=ghost, vtk_cells=vtk_cells, interleaved=interleaved, **kwargs)
+
+    def register_variable(self, name, mesh_name, dp, var_type, centering, domain=None, static=False, **kwargs):
+
+        if domain is None:
+            domain = self.__rank
+
+        VisitInstrumentation.register_variable(self, name, mesh_name, dp, var_type, centering, domain=domain, static=static, **kwargs)
+
+    def register_material(self, name, mesh_name, dp, materials, domain=None, static=False):
+
+        if domain is None:
+            domain = self.__rank
+
+        VisitInstrumentation.register_material(self, name, mesh_name, dp, materials, domain=domain, static=static)
 
-    def register_variable(self, name, mesh_name, dp, var_type, centering, domain=None, **kwargs):
+    def register_species(self, name, mesh_name, material_name, dp, species, domain=None, static=False):
 
         if domain is None:
             domain = self.__rank
 
-        VisitInstrumentation.register_variable(self, name, mesh_name, dp, var_type, centering, domain=domain, **kwargs)
+        VisitInstrumentation.register_species(self, name, mesh_name, material_name, dp, species, domain=domain, static=static)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import math
+import time
+
+__author__ = 'Christoph Statz'
+
+
+class PollPolicy(object):
+    """
+    Decides after how many simulation steps VisIt is polled for input again.
+
+    VisIt is polled every steps steps or every interval seconds, whichever comes
+    first. Without steps, only the interval bounds the cadence (every step if
+    there is no interval either). The interval is translated into a number of steps from a moving
+    average of the measured step duration. The cadence is only retuned when
+    VisIt is actually polled, so all ranks of a parallel run can agree on it
+    at that point. As steps may suddenly get slower, a poll is also due once
+    interval seconds of wall time passed since the last one.
+    """
+
+    def __init__(self, steps=None, interval=None, smoothing=0.2, clock=time.time):
+
+        if steps is None and interval is None:
+            steps = 1
+
+        self.steps = None if steps is None else max(1, int(steps))
+        self.interval = interval
+        self.smoothing = smoothing
+        self.every = self.steps or 1
+        self.step_duration = None
+        self.__clock = clock
+        self.__count = 0
+        self.__last = clock()
+
+    def due(self):
+
+        if self.__count >= self.every:
+            return True
+
+        return self.interval is not None and self.__clock() - self.__last >= self.interval
+
+    def record(self, duration):
+
+        self.__count += 1
+
+        if self.step_duration is None:
+            self.step_duration = duration
+        else:
+            self.step_duration += self.smoothing * (duration - self.step_duration)
+
+    def tune(self):
+
+        self.__count = 0
+        self.__last = self.__clock()
+
+        if self.interval is None or not self.step_duration:
+            return self.every
+
+        every = max(1, int(math.floor(self.interval / self.step_duration)))
+        if self.steps is not None:
+            every = min(self.steps, every)
+
+        self.every = every
+
+        return self.every
+
+
+class UpdatePolicy(object):
+    """
+    Decides in which cycles the plots of a connected VisIt client are updated.
+
+    Plots are updated at most every cycles cycles, not more often than every
+    interval seconds and only if the time spent in updates stays below
+    fraction of the wall time. The cost of an update is a moving average of
+    the measured duration of VisItTimeStepChanged, VisItUpdatePlots and
+    VisItSynchronize.
+    """
+
+    def __init__(self, cycles=1, fraction=None, interval=None, smoothing=0.2, clock=time.time):
+
+        self.cycles = max(1, int(cycles))
+        self.fraction = fraction
+        self.interval = interval
+        self.smoothing = smoothing
+        self.cost = None
+        self.__clock = clock
+        self.__count = 0
+        self.__last = None
+
+    @property
+    def deterministic(self):
+        """True if the decision only depends on the cycle count, i.e. is identical on all ranks."""
+        return self.fraction is None and self.interval is None
+
+    def advance(self):
+        self.__count += 1
+
+    def due(self):
+
+        if self.__count < self.cycles:
+            return False
+
+        if self.__last is None or self.deterministic:
+            return True
+
+        elapsed = self.__clock() - self.__last
+
+        if self.interval is not None and elapsed < self.interval:
+            return False
+
+        if self.fraction is not None and self.cost is not None:
+            # cost / (elapsed + cost) <= fraction
+            if elapsed < self.cost * (1. - self.fraction) / self.fraction:
+                return False
+
+        return True
+
+    def record(self, duration):
+
+        self.__count = 0
+        self.__last = self.__clock()
+
+        if self.cost is None:
+            self.cost = duration
+        else:
+            self.cost += self.smoothing * (duration - self.cost)
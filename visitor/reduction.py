@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+from .history import History
+
+__author__ = 'Christoph Statz'
+
+
+# How the partial results of the ranks are combined, per entry of the packed buffer.
+MIN = 0
+MAX = 1
+SUM = 2
+
+# Partial results of a reduction packed into its slice of the buffer, the histogram follows.
+PARTIALS = (('min', MIN), ('max', MAX), ('sum', SUM), ('count', SUM), ('sum_of_squares', SUM))
+
+REDUCTIONS = ('min', 'max', 'mean', 'std', 'sum', 'count')
+
+
+def combine(a, b, kinds):
+    """Combines the packed partial results a and b, every row of len(kinds) entries is one buffer."""
+
+    a = a.reshape(-1, len(kinds))
+    b = b.reshape(-1, len(kinds))
+
+    return np.where(kinds == MIN, np.minimum(a, b), np.where(kinds == MAX, np.maximum(a, b), a + b)).reshape(-1)
+
+
+class Reduction(object):
+    """
+    Global min, max, mean, std, sum, count and histogram of a registered variable.
+
+    Every cycle, the local domains reduce into the partial results of this reduction
+    (vectorized, ghost zones excluded if the arrays are shaped like the mesh), all
+    reductions are combined with one collective operation and the results appended
+    to one history per requested reduction. Vector and tensor variables are reduced
+    by magnitude. The histogram has bins equal bins over range, values outside are not counted.
+    """
+
+    def __init__(self, name, variable_name, reductions=('min', 'max', 'mean'), bins=None, range=None, capacity=10000, max_points=1000):
+
+        unknown = set(reductions) - set(REDUCTIONS)
+        if unknown:
+            raise ValueError('Unknown reductions %s, expected some of %s!' % (sorted(unknown), str(REDUCTIONS)))
+
+        if bins is not None and range is None:
+            raise ValueError('A histogram of %s needs a fixed range to be combined across ranks!' % name)
+
+        self.name = name
+        self.variable_name = variable_name
+        self.reductions = tuple(reductions)
+        self.bins = bins
+        self.range = range
+
+        self.histories = dict((reduction, History(capacity, max_points)) for reduction in self.reductions)
+        self.values = dict((reduction, np.nan) for reduction in self.reductions)
+
+        if bins is not None:
+            edges = np.linspace(range[0], range[1], bins + 1)
+            self.centers = (edges[:-1] + edges[1:]) / 2
+            self.counts = np.zeros(bins)
+
+        self.size = len(PARTIALS) + (bins or 0)
+        self.kinds = np.array([kind for partial, kind in PARTIALS] + [SUM] * (bins or 0), dtype=np.int32)
+
+    def clear(self, buf):
+        """Neutral partial results, e.g. for a rank without domains of the variable."""
+
+        buf[:] = 0
+        buf[0] = np.inf
+        buf[1] = -np.inf
+
+    def reduce(self, data, ghost, buf, multi_component=False):
+        """Adds the values of one local domain to the partial results in buf."""
+
+        if isinstance(data, tuple):
+            data = np.stack([np.asarray(c) for c in data], axis=-1)
+        else:
+            data = np.asarray(data)
+
+        if multi_component:
+            data = np.sqrt(np.einsum('...i,...i->...', data, data))
+
+        if data.dtype.kind != 'f':
+            data = data.astype(np.float64)
+
+        if ghost is not None and data.ndim == len(ghost):
+            data = data[tuple(slice(low, n - high) for n, (low, high) in zip(data.shape, ghost[::-1]))]
+
+        if data.size == 0:
+            return
+
+        buf[0] = min(buf[0], data.min())
+        buf[1] = max(buf[1], data.max())
+        buf[2] += data.sum(dtype=np.float64)
+        buf[3] += data.size
+        buf[4] += np.vdot(data, data).real
+
+        if self.bins is not None:
+            buf[len(PARTIALS):] += np.histogram(data, self.bins, self.range)[0]
+
+    def finish(self, buf, x):
+        """Derives the reductions from the combined partial results and appends them at x."""
+
+        minimum, maximum, total, count, squares = buf[:len(PARTIALS)]
+
+        if count > 0:
+            mean = total / count
+            results = dict(min=minimum, max=maximum, mean=mean, std=np.sqrt(max(squares / count - mean * mean, 0.)), sum=total, count=count)
+        else:
+            results = dict(min=np.nan, max=np.nan, mean=np.nan, std=np.nan, sum=0., count=0.)
+
+        for reduction in self.reductions:
+            self.values[reduction] = results[reduction]
+            self.histories[reduction].append(x, results[reduction])
+
+        if self.bins is not None:
+            self.counts[:] = buf[len(PARTIALS):]
+
+    def histogram(self, *args, **kwargs):
+        """Curve data provider of the last histogram."""
+        return self.centers, self.counts
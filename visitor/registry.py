@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+__author__ = 'Christoph Statz'
+
+
+class Entry(object):
+    """
+    Registered object exposed to VisIt via the metadata callback.
+
+    metadata holds every key that has a metadata setter in libsim, setters
+    is the compiled list of (setter, value) calls. It is rebuilt lazily after
+    metadata changed.
+    """
+
+    __slots__ = ('name', 'metadata', 'setters')
+
+    def __init__(self, name, **metadata):
+
+        self.name = name
+        self.metadata = metadata
+        self.metadata['name'] = name
+        self.setters = None
+
+    def update(self, **metadata):
+
+        self.metadata.update(metadata)
+        self.setters = None
+
+    def compile(self, table):
+        """table is a sequence of (metadata key, libsim setter)."""
+
+        if self.setters is None:
+            self.setters = tuple((setter, self.metadata[key]) for key, setter in table if key in self.metadata)
+
+        return self.setters
+
+
+class Mesh(Entry):
+
+    __slots__ = ('mesh_type', 'number_of_domains', 'data_provider', 'static', 'static_data', 'stride', 'ghost', 'interleaved')
+
+    def __init__(self, name, mesh_type, spatial_dimension, number_of_domains, static=False, **metadata):
+
+        metadata.setdefault('topological_dimension', spatial_dimension)
+        Entry.__init__(self, name, mesh_type=mesh_type, spatial_dimension=spatial_dimension, number_of_domains=number_of_domains, **metadata)
+
+        self.mesh_type = mesh_type
+        self.number_of_domains = number_of_domains
+        self.data_provider = dict()
+        self.static = static
+        self.static_data = dict()
+        self.stride = 1
+        self.ghost = dict()
+        self.interleaved = False
+
+
+class Variable(Entry):
+
+    __slots__ = ('mesh_name', 'data_provider', 'static', 'static_data', 'multi_component', 'components')
+
+    def __init__(self, name):
+
+        Entry.__init__(self, name)
+
+        self.mesh_name = None
+        self.data_provider = dict()
+        self.static = False
+        self.static_data = dict()
+        self.multi_component = False
+        self.components = ()
+
+
+class Curve(Entry):
+
+    __slots__ = ('data_provider', )
+
+    def __init__(self, name, dp, **metadata):
+
+        Entry.__init__(self, name, **metadata)
+        self.data_provider = dp
+
+
+class Expression(Entry):
+
+    __slots__ = ()
+
+
+class Material(Entry):
+
+    __slots__ = ('mesh_name', 'materials', 'data_provider', 'static', 'static_data')
+
+    def __init__(self, name, mesh_name, materials):
+
+        Entry.__init__(self, name, mesh_name=mesh_name)
+
+        self.mesh_name = mesh_name
+        self.materials = tuple(materials)
+        self.data_provider = dict()
+        self.static = False
+        self.static_data = dict()
+
+
+class Species(Entry):
+
+    __slots__ = ('mesh_name', 'species', 'data_provider', 'static', 'static_data')
+
+    def __init__(self, name, mesh_name, material_name, species):
+
+        Entry.__init__(self, name, mesh_name=mesh_name, material_name=material_name)
+
+        self.mesh_name = mesh_name
+        self.species = tuple(tuple(names) for names in species)
+        self.data_provider = dict()
+        self.static = False
+        self.static_data = dict()
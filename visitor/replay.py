@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import json
+import time
+import threading
+
+from . import libsim
+
+__author__ = 'Christoph Statz'
+
+
+# libsim callback registrar of every recorded callback event.
+CALLBACKS = {
+    'metadata': 'VisItSetGetMetaData',
+    'mesh': 'VisItSetGetMesh',
+    'variable': 'VisItSetGetVariable',
+    'curve': 'VisItSetGetCurve',
+    'domain_list': 'VisItSetGetDomainList',
+    'material': 'VisItSetGetMaterial',
+    'species': 'VisItSetGetSpecies',
+    'command': 'VisItSetCommandCallback',
+}
+
+
+class Recorder(object):
+    """
+    Records the callbacks issued by the VisIt engine and the simulation steps as JSON lines.
+
+    Every line holds the event, its offset t from the start of the recording, its
+    duration and, for callbacks, the arguments without the trailing cbdata.
+    """
+
+    def __init__(self, filename, clock=time.time):
+
+        self.filename = filename
+        self.clock = clock
+        self.start = clock()
+        self.lock = threading.Lock()
+        self.file = open(filename, 'w')
+
+    def record(self, event, t, duration, args=()):
+
+        line = json.dumps(dict(event=event, t=t - self.start, duration=duration, args=list(args)))
+
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line + '\n')
+
+    def wrap(self, event, func):
+        """Wraps a libsim callback, its last argument (cbdata) is not recorded."""
+
+        def recorded(*args):
+            start = self.clock()
+            try:
+                return func(*args)
+            finally:
+                self.record(event, start, self.clock() - start, args[:-1])
+
+        return recorded
+
+    def close(self):
+
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def load(filename):
+
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(events, instrumentation, step=None, realtime=False):
+    """
+    Replays recorded events against instrumentation, which has to be set up with
+    the simV2 stand-in from visitor/fake and the same registrations as the
+    recorded session.
+
+    Callbacks are invoked like the VisIt engine did and their handles are freed
+    afterwards. Recorded steps run step (a no-op by default) through the regular
+    step path of the instrumentation, so caches, plot updates and level of detail
+    behave as in the recorded session. With realtime=True the recorded offsets are
+    kept. Returns a list of (event, args, recorded duration, replayed duration).
+    """
+
+    simV2 = libsim.load()
+
+    if not hasattr(simV2, 'state'):
+        raise RuntimeError('Replaying needs the simV2 stand-in from visitor/fake!')
+
+    if isinstance(events, str):
+        events = load(events)
+
+    if not instrumentation.visit_is_connected:
+        instrumentation.connect_visit()
+
+    if step is None:
+        step = lambda: None
+
+    results = list()
+    start = time.time()
+
+    for event in events:
+
+        if realtime:
+            delay = event['t'] - (time.time() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        begin = time.time()
+
+        if event['event'] == 'step':
+            run_mode = instrumentation.run_mode
+            instrumentation.run_mode = simV2.VISIT_SIMMODE_RUNNING
+            instrumentation.step_wrapper(step)
+            instrumentation.run_mode = run_mode
+        else:
+            h = simV2.state.callbacks[CALLBACKS[event['event']]](*(event['args'] + [None]))
+            simV2.free(h)
+
+        results.append((event['event'], tuple(event['args']), event['duration'], time.time() - begin))
+
+    return results
+
+
+def summary(results):
+    """Recorded and replayed total time per event and name."""
+
+    totals = dict()
+
+    for event, args, recorded, replayed in results:
+        key = (event, ' '.join(str(a) for a in args if isinstance(a, str)))
+        count, recorded_sum, replayed_sum = totals.get(key, (0, 0., 0.))
+        totals[key] = (count + 1, recorded_sum + recorded, replayed_sum + replayed)
+
+    lines = list()
+
+    for (event, name), (count, recorded, replayed) in sorted(totals.items(), key=lambda item: -item[1][2]):
+        lines.append('%-12s %-24s n=%d, recorded=%.3g s, replayed=%.3g s' % (event, name, count, recorded, replayed))
+
+    return '\n'.join(lines)
@@ -7,27 +7,128 @@ import os
 import socket
 import time
 import logging
+import threading
+import select
+import functools
+import numpy as np
+
+
+from . import libsim
+from .helper import get_dtype_size_owner, S, P
+from .buffer import BufferPool, VISIT_DTYPES, freeze
+from .cache import ProviderCache
+from .registry import Mesh, Variable, Curve, Expression, Material, Species
+from .policy import PollPolicy, UpdatePolicy
+from .snapshot import Snapshot
+from .batch import BatchPipeline
+from .metrics import Metrics
+from .replay import Recorder
+from .source import as_provider
+from .material import material_lists
+from .unstructured import VTKConnectivity
+from .history import History
+from .reduction import Reduction
+from .lod import LOD_STRIDES, structured_dims, decimate_mesh, decimate_nodes, decimate_zones, ghost_widths, real_indices
 
 
-from .helper import get_visit_dirs, get_dtype_size_owner, S, P
+__author__ = 'Christoph Statz'
 
+# simV2 is imported on first use, libsim.load() binds its names to this module.
+libsim.bind(globals())
+__getattr__ = libsim.getattr_hook(__name__)
 
-__author__ = 'Christoph Statz'
 
-# Find VisIt lib path
-lib_path, visit_home = get_visit_dirs()
+# (metadata key, libsim setter name) for every object type exposed in the metadata callback.
+MESH_METADATA = (('name', 'VisIt_MeshMetaData_setName'),
+                 ('mesh_type', 'VisIt_MeshMetaData_setMeshType'),
+                 ('topological_dimension', 'VisIt_MeshMetaData_setTopologicalDimension'),
+                 ('spatial_dimension', 'VisIt_MeshMetaData_setSpatialDimension'),
+                 ('number_of_domains', 'VisIt_MeshMetaData_setNumDomains'),
+                 ('domain_title', 'VisIt_MeshMetaData_setDomainTitle'),
+                 ('domain_piece_name', 'VisIt_MeshMetaData_setDomainPieceName'),
+                 ('number_of_groups', 'VisIt_MeshMetaData_setNumGroups'),
+                 ('xunits', 'VisIt_MeshMetaData_setXUnits'),
+                 ('yunits', 'VisIt_MeshMetaData_setYUnits'),
+                 ('zunits', 'VisIt_MeshMetaData_setZUnits'),
+                 ('xlabel', 'VisIt_MeshMetaData_setXLabel'),
+                 ('ylabel', 'VisIt_MeshMetaData_setYLabel'),
+                 ('zlabel', 'VisIt_MeshMetaData_setZLabel'))
+
+VARIABLE_METADATA = (('name', 'VisIt_VariableMetaData_setName'),
+                     ('mesh_name', 'VisIt_VariableMetaData_setMeshName'),
+                     ('type', 'VisIt_VariableMetaData_setType'),
+                     ('centering', 'VisIt_VariableMetaData_setCentering'),
+                     ('units', 'VisIt_VariableMetaData_setUnits'))
+
+CURVE_METADATA = (('name', 'VisIt_CurveMetaData_setName'),
+                  ('xlabel', 'VisIt_CurveMetaData_setXLabel'),
+                  ('xunits', 'VisIt_CurveMetaData_setXUnits'),
+                  ('ylabel', 'VisIt_CurveMetaData_setYLabel'),
+                  ('yunits', 'VisIt_CurveMetaData_setYUnits'))
+
+EXPRESSION_METADATA = (('name', 'VisIt_ExpressionMetaData_setName'),
+                       ('definition', 'VisIt_ExpressionMetaData_setDefinition'),
+                       ('type', 'VisIt_ExpressionMetaData_setType'))
+
+MATERIAL_METADATA = (('name', 'VisIt_MaterialMetaData_setName'),
+                     ('mesh_name', 'VisIt_MaterialMetaData_setMeshName'))
+
+SPECIES_METADATA = (('name', 'VisIt_SpeciesMetaData_setName'),
+                    ('mesh_name', 'VisIt_SpeciesMetaData_setMeshName'),
+                    ('material_name', 'VisIt_SpeciesMetaData_setMaterialName'))
+
+
+def setters(table):
+    """Resolves the setter names of a metadata table, simV2 has to be loaded."""
+    return tuple((key, globals()[name]) for key, name in table)
+
+
+def add_species_names(h, names):
+    """Adds the species of one material to species metadata h, VisIt frees the name list with h."""
+
+    hn = VisIt_NameList_alloc()
+    for name in names:
+        VisIt_NameList_addName(hn, name)
+    VisIt_SpeciesMetaData_addSpeciesName(h, hn)
+
+
+# Numbers of components (2d, 3d) of the multi-component variable types.
+VARIABLE_COMPONENTS = (('VISIT_VARTYPE_VECTOR', (2, 3)),
+                       ('VISIT_VARTYPE_TENSOR', (4, 9)),
+                       ('VISIT_VARTYPE_SYMMETRIC_TENSOR', (3, 6)))
+
+
+def variable_components(var_type):
+    """Allowed numbers of components of var_type, empty for scalar variables. simV2 has to be loaded."""
+    return dict((globals()[name], components) for name, components in VARIABLE_COMPONENTS).get(var_type, ())
+
+
+def components_last(data, components):
+    """
+    Multi-component data with the components along one last axis (or a tuple of components).
+    Tensors shaped (..., d, d) are flattened to (..., d*d). Raises a ValueError if the number
+    of components is not one of components.
+    """
+
+    if isinstance(data, tuple):
+        k = len(data)
+    else:
+        data = np.asarray(data)
+        if data.ndim > 2 and data.shape[-1] == data.shape[-2] and data.shape[-1] ** 2 in components:
+            data = data.reshape(data.shape[:-2] + (data.shape[-1] ** 2, ))
+        k = data.shape[-1] if data.ndim > 1 else 1
 
-# Append VisIt lib path to path before importing simV2
-if lib_path not in sys.path:
-    sys.path.insert(1, lib_path)
+    if k not in components:
+        raise ValueError('Expected %s components, got %d!' % (' or '.join(str(c) for c in components), k))
 
-from simV2 import *
-sys.stdin.flush()
+    return data
 
 
 class VisitInstrumentation(object):
     
-    def __init__(self, name, description, prefix=".", step=None, cycle_time_provider=None, trace=False, master=True, ui=None, input=None, init_env=True):
+    def __init__(self, name, description, prefix=".", step=None, cycle_time_provider=None, trace=False, master=True, ui=None, input=None, init_env=True, cache_budget=None, poll_steps=None, poll_interval=None, threaded=False, update_cycles=1, update_fraction=None, update_interval=None, metrics_file=None, record_file=None):
+
+        libsim.load()
 
         self.__step = step
         self.__cycle_time_provider = cycle_time_provider
@@ -42,12 +143,18 @@ class VisitInstrumentation(object):
         self.__number_of_domains = dict()
         self.logger = logging.getLogger(__name__)
 
+        self.metrics = Metrics()
+        self.metrics_file = metrics_file
+
+        self.__recorder = None
+
         if trace: 
             self.__trace_qualifier = "trace.%s.%s.%i.txt" % (self.__name, socket.gethostname(), os.getpid())
             VisItOpenTraceFile(self.__trace_qualifier)
 
         if init_env:
-            VisItSetDirectory(visit_home)
+            if libsim.visit_home is not None:
+                VisItSetDirectory(libsim.visit_home)
             VisItSetupEnvironment()
 
         if self.__master:
@@ -56,6 +163,8 @@ class VisitInstrumentation(object):
                 raise ValueError('VisItInitializeSocketAndDumpSimFile failed for some reason!')
 
         self.timeout = 10000   # us
+        self.poll = PollPolicy(poll_steps, poll_interval)
+        self.updates = UpdatePolicy(update_cycles, update_fraction, update_interval)
         self.run_mode = VISIT_SIMMODE_RUNNING
         self.visit_is_connected = False
 
@@ -64,6 +173,8 @@ class VisitInstrumentation(object):
         self.__ui_elements['value_input'] = dict()
         self.__ui_elements['checkbox'] = dict()
 
+        self.__metadata = None
+
         self.commands = dict()
         self.commands['visit'] = dict()
         self.commands['console'] = dict()
@@ -74,6 +185,8 @@ class VisitInstrumentation(object):
         self.register_generic_command("run", self.__gc_run, None)
         self.register_generic_command("step", self.__gc_step, None)
         self.register_generic_command("usage", self.__gc_mem_usage, None)
+        self.register_generic_command("lod", self.__gc_level_of_detail, None)
+        self.register_generic_command("metrics", self.__gc_metrics, None)
 
         self.register_console_command("halt", self.__gc_halt, None)
         self.register_console_command("run", self.__gc_run, None)
@@ -84,6 +197,38 @@ class VisitInstrumentation(object):
         self.__variables = dict()
         self.__curves = dict()
         self.__expressions = dict()
+        self.__materials = dict()
+        self.__species = dict()
+        self.__reductions = list()
+        self.__reduction_kinds = np.zeros(0, dtype=np.int32)
+        self.__reduction_buffer = np.zeros(0)
+
+        self.__mesh_builders = dict()
+        self.__mesh_builders[VISIT_MESHTYPE_UNSTRUCTURED] = self.__unstructured_mesh
+        self.__mesh_builders[VISIT_MESHTYPE_CSG] = self.__csg_mesh
+        self.__mesh_builders[VISIT_MESHTYPE_POINT] = self.__point_mesh
+        self.__mesh_builders[VISIT_MESHTYPE_RECTILINEAR] = self.__rectilinear_mesh
+        self.__mesh_builders[VISIT_MESHTYPE_CURVILINEAR] = self.__curvilinear_mesh
+
+        self.__batch = None
+        self.__mesh_dims = dict()
+        self.__lod_cache = dict()
+        self.__static_lod_cache = dict()
+
+        self.__buffers = BufferPool()
+
+        self.__cycle = 0
+        self.__cache = None
+        if cache_budget is not None:
+            self.__cache = ProviderCache(cache_budget)
+
+        self.__snapshot = None
+        if threaded:
+            self.__snapshot = Snapshot()
+            self.__publish_request = threading.Event()
+            self.__step_request = threading.Event()
+            self.__wakeup = threading.Event()
+            self.__wakeup_pipe = os.pipe()
 
         self.__ui_set_int = dict()
         self.__ui_set_string = dict()
@@ -92,6 +237,9 @@ class VisitInstrumentation(object):
 
         self.done = False
 
+        if record_file is not None:
+            self.start_recording(record_file)
+
     def __del__(self):
 
         if self.visit_is_connected:
@@ -99,6 +247,8 @@ class VisitInstrumentation(object):
             VisItDisconnect()
             self.logger.debug("VisIt disconnected.")
 
+        self.stop_recording()
+
         if self.__master:
             os.remove(self.__prefix+'/'+self.__name+'.sim2')
             self.logger.debug("Sim2 file %s removed." % (self.__prefix+'/'+self.__name+'.sim2'))
@@ -112,34 +262,22 @@ class VisitInstrumentation(object):
         if self.done:
             return True
 
-        if self.visit_is_connected and self.run_mode == VISIT_SIMMODE_STOPPED:
-            time.sleep(0.1)
+        if self.run_mode == VISIT_SIMMODE_RUNNING and callable(step) and not self.poll_due():
+            self.__run_step(step)
+            return
 
         if self.__master:
-            for key in self.__ui_set_int:
-                value = self.__ui_set_int[key]()
-                if value != self.__ui_val_int_old[key]:
-                    VisItUI_setValueI(key, value, 1)
-                    self.__ui_val_int_old[key] = value
+            self.__update_ui_values()
 
-            for key in self.__ui_set_string:
-                value = self.__ui_set_string[key]()
-                if value != self.__ui_val_string_old[key]:
-                    VisItUI_setValueS(key, value, 1)
-                    self.__ui_val_string_old[key] = value
+        # Without anything to compute, block until VisIt or the console have input.
+        blocking = self.run_mode == VISIT_SIMMODE_STOPPED or not callable(step)
 
-        state = self.get_input_from_visit()
+        self.poll.tune()
+        state = self.get_input_from_visit(blocking)
 
         if state == S.OKAY.value:
-            if self.run_mode == VISIT_SIMMODE_RUNNING:
-                if callable(step):
-                    step()
-                    if self.visit_is_connected:
-                        VisItTimeStepChanged()
-                        VisItUpdatePlots()
-                        VisItSynchronize()
-                else:
-                    time.sleep(0.1)
+            if self.run_mode == VISIT_SIMMODE_RUNNING and callable(step):
+                self.__run_step(step)
 
         elif state == S.LSI.value:
             self.connect_visit()
@@ -150,32 +288,261 @@ class VisitInstrumentation(object):
         else:
             self.logger.warn("Visit state unexpected: %s" % state)
 
+    def __update_ui_values(self):
+
+        for key in self.__ui_set_int:
+            value = self.__ui_set_int[key]()
+            if value != self.__ui_val_int_old[key]:
+                VisItUI_setValueI(key, value, 1)
+                self.__ui_val_int_old[key] = value
+
+        for key in self.__ui_set_string:
+            value = self.__ui_set_string[key]()
+            if value != self.__ui_val_string_old[key]:
+                VisItUI_setValueS(key, value, 1)
+                self.__ui_val_string_old[key] = value
+
+    def __run_step(self, step):
+
+        start = time.time()
+        step()
+        self.poll.record(time.time() - start)
+
+        self.__advance_cycle()
+        if self.visit_is_connected and self.update_due():
+            self.update_plots()
+
+        if self.__batch is not None and self.__batch.due(self.__cycle):
+            self.render()
+
+        if self.__recorder is not None:
+            self.__recorder.record('step', start, time.time() - start)
+
+    def poll_due(self):
+        return self.poll.due()
+
+    def update_due(self):
+        return self.updates.due()
+
     def run(self):
 
+        if self.__snapshot is not None:
+            return self.__run_threaded()
+
         while True:
 
             if self.step_wrapper(self.__step):
                 break
 
-    def get_input_from_visit(self):
-        return VisItDetectInputWithTimeout(int(self.run_mode == VISIT_SIMMODE_STOPPED), self.timeout, sys.stdin.fileno())
+    def __run_threaded(self):
+
+        service = threading.Thread(target=self.__serve, name='visit-service')
+        service.daemon = True
+        service.start()
+
+        while not self.done:
+
+            if callable(self.__step) and (self.run_mode == VISIT_SIMMODE_RUNNING or self.__step_request.is_set()):
+                # An explicit step command is always shown, regardless of the update policy.
+                requested = self.__step_request.is_set()
+                self.__step_request.clear()
+                start = time.time()
+                self.__step()
+                self.__advance_cycle()
+                if self.visit_is_connected and (requested or self.update_due()):
+                    if not self.publish() and requested:
+                        self.__publish_request.set()
+                if self.__recorder is not None:
+                    self.__recorder.record('step', start, time.time() - start)
+
+            elif self.__publish_request.is_set():
+                # Retried once VisIt released the previous snapshot.
+                if not self.publish():
+                    self.__wakeup.wait()
+                    self.__wakeup.clear()
+
+            else:
+                self.__wakeup.wait()
+                self.__wakeup.clear()
+
+        service.join()
+
+    def __wake(self):
+
+        if self.__snapshot is not None:
+            self.__wakeup.set()
+
+    def __serve(self):
+
+        while not self.done:
+
+            if self.__snapshot.adopt():
+                self.__lod_cache.clear()
+                if self.visit_is_connected:
+                    if self.__master:
+                        self.__update_ui_values()
+                    self.update_plots()
+                self.__snapshot.release()
+                self.__wake()
+
+            # A new snapshot is announced through the wakeup pipe.
+            ready = self.wait_for_input(fds=(self.__wakeup_pipe[0], ))
+
+            if self.__wakeup_pipe[0] in ready:
+                os.read(self.__wakeup_pipe[0], 4096)
+                if len(ready) == 1:
+                    continue
+
+            state = VisItDetectInputWithTimeout(0, 0, sys.stdin.fileno())
+
+            if state == S.OKAY.value:
+                continue
+            elif state == S.LSI.value:
+                self.connect_visit()
+                self.__publish_request.set()
+                self.__wake()
+            elif state == S.ESI.value:
+                self.process_engine_command()
+            elif state == S.CSI.value:
+                self.process_console_command()
+            else:
+                self.logger.warn("Visit state unexpected: %s" % state)
+
+    def publish(self):
+        """
+        Publishes a snapshot of all registered mesh and variable data for the VisIt service thread.
+        Returns False if the cycle was skipped, because VisIt still uses the previous snapshot.
+        """
+
+        published = self.__snapshot.publish(self.__cycle, self.__snapshot_items())
+        if published:
+            self.__publish_request.clear()
+            os.write(self.__wakeup_pipe[1], b'p')
+
+        return published
+
+    def __snapshot_items(self):
+
+        for kind, registry in (('mesh', self.__meshes), ('variable', self.__variables), ('material', self.__materials), ('species', self.__species)):
+            for entry in registry.values():
+                for domain, dp in entry.data_provider.items():
+                    if entry.static:
+                        self.__provide(kind, entry, domain, dp)
+                    else:
+                        yield (kind, entry.name, domain), self.metrics.call('provider_' + kind, entry.name, domain, dp)
+
+        # Curves (including histories and reductions) are copied as well, their providers see live simulation state.
+        for curve in self.__curves.values():
+            yield ('curve', curve.name, -1), self.metrics.call('provider_curve', curve.name, -1, curve.data_provider)
+
+    def get_input_from_visit(self, blocking=False):
+        return VisItDetectInputWithTimeout(int(blocking), self.timeout, sys.stdin.fileno())
+
+    def wait_for_input(self, timeout=None, fds=()):
+        """
+        Blocks until the VisIt listen or engine socket, the console or one of fds is readable.
+        Returns the readable file descriptors.
+        """
+
+        fds = list(fds) + [sys.stdin.fileno()]
+
+        if self.visit_is_connected:
+            fds.append(VisItGetEngineSocket())
+        else:
+            fds.append(VisItGetListenSocket())
+
+        try:
+            return select.select([fd for fd in fds if fd >= 0], [], [], timeout)[0]
+        except (select.error, OSError, ValueError):
+            return []
 
     def connect_visit(self):
 
         if VisItAttemptToCompleteConnection() == VISIT_OKAY:
             self.logger.info("VisIt connected.")
             self.__gc_halt()
-            VisItSetCommandCallback(self.__cb_command, 0)
-            VisItSetGetMetaData(self.__cb_metadata, 0)
-            VisItSetGetMesh(self.__cb_mesh, 0)
-            VisItSetGetVariable(self.__cb_variable, 0)
-            if self.__master:
-                VisItSetGetCurve(self.__cb_curve, 0)
+            self.__register_callbacks()
             self.visit_is_connected = True
-            VisItSetGetDomainList(self.__cb_domain_list, 0)
         else:
             self.logger.warn("Connection to VisIt failed: %s" % VisItGetLastError)
 
+    def __register_callbacks(self):
+
+        VisItSetCommandCallback(self.__callback('command', self.__cb_command), 0)
+        VisItSetGetMetaData(self.__callback('metadata', self.metrics.wrap('cb_metadata', self.__cb_metadata)), 0)
+        VisItSetGetMesh(self.__callback('mesh', self.metrics.wrap('cb_mesh', self.__cb_mesh, 1, 0)), 0)
+        VisItSetGetVariable(self.__callback('variable', self.metrics.wrap('cb_variable', self.__cb_variable, 1, 0)), 0)
+        if self.__master:
+            VisItSetGetCurve(self.__callback('curve', self.metrics.wrap('cb_curve', self.__cb_curve, 0)), 0)
+        VisItSetGetDomainList(self.__callback('domain_list', self.metrics.wrap('cb_domain_list', self.__cb_domain_list, 0)), 0)
+        VisItSetGetMaterial(self.__callback('material', self.metrics.wrap('cb_material', self.__cb_material, 1, 0)), 0)
+        VisItSetGetSpecies(self.__callback('species', self.metrics.wrap('cb_species', self.__cb_species, 1, 0)), 0)
+
+    def __callback(self, event, func):
+
+        if self.__recorder is not None:
+            return self.__recorder.wrap(event, func)
+
+        return func
+
+    def start_recording(self, filename):
+        """Records the callbacks issued by VisIt and the simulation steps to filename, see visitor.replay."""
+
+        self.stop_recording()
+        self.__recorder = Recorder(filename)
+        self.logger.info("Recording VisIt session to %s." % filename)
+
+        if self.visit_is_connected:
+            self.__register_callbacks()
+
+    def stop_recording(self):
+
+        if self.__recorder is None:
+            return
+
+        self.__recorder.close()
+        self.logger.info("VisIt session recorded to %s." % self.__recorder.filename)
+        self.__recorder = None
+
+        if self.visit_is_connected:
+            self.__register_callbacks()
+
+    def enable_batch(self, plots, every=1, filename='%(name)s_%(cycle)06d.png', width=1024, height=1024, image_format=None):
+        """
+        Renders plots without a connected VisIt client and saves an image every every cycles.
+        See BatchPipeline for the description of plots.
+        """
+
+        if not callable(self.__step):
+            raise ValueError('Batch mode requires a step function!')
+
+        if self.__snapshot is not None:
+            raise ValueError('Batch mode is not supported with threaded=True!')
+
+        self.__batch = BatchPipeline(plots, every=every, filename=filename, width=width, height=height, image_format=image_format)
+
+        VisItInitializeRuntime()
+        self.__register_callbacks()
+
+        self.logger.info("Batch mode enabled, saving %d plots every %d cycles." % (len(self.__batch.plots), self.__batch.every))
+
+    def render(self):
+
+        VisItTimeStepChanged()
+        self.__buffers.advance()
+
+        if not self.__batch.ready:
+            self.__batch.setup()
+        else:
+            VisItUpdatePlots()
+
+        filename, success = self.__batch.save(self.__name, self.__cycle)
+
+        if success:
+            self.logger.debug("Saved window to %s." % filename)
+        else:
+            self.logger.warn("Saving window to %s failed: %s" % (filename, VisItGetLastError()))
+
     def process_engine_command(self):
 
         value = VisItProcessEngineCommand()
@@ -188,6 +555,108 @@ class VisitInstrumentation(object):
             self.logger.debug("VisIt disconnected.")
             self.__gc_run()
             self.visit_is_connected = False
+            self.__buffers.clear()
+
+    def __advance_cycle(self):
+
+        self.__cycle += 1
+        self.updates.advance()
+
+        # In threaded mode, decimated data belongs to the snapshot and is dropped when the service thread adopts the next one.
+        if self.__snapshot is None:
+            self.__lod_cache.clear()
+        if self.__cache is not None:
+            self.__cache.invalidate()
+
+        if self.__reductions:
+            self.__reduce()
+
+    def __reduce(self):
+
+        start = time.time()
+        buf = self.__reduction_buffer
+        offset = 0
+
+        for reduction in self.__reductions:
+            part = buf[offset:offset + reduction.size]
+            reduction.clear(part)
+
+            variable = self.__variables.get(reduction.variable_name)
+            if variable is not None:
+                mesh = self.__meshes.get(variable.mesh_name)
+                for domain, dp in variable.data_provider.items():
+                    ghost = mesh.ghost.get(domain) if mesh is not None else None
+                    reduction.reduce(self.__reduction_data(variable, domain, dp), ghost, part, variable.multi_component)
+
+            offset += reduction.size
+
+        buf = self.combine_reductions(buf, self.__reduction_kinds)
+
+        offset = 0
+        for reduction in self.__reductions:
+            reduction.finish(buf[offset:offset + reduction.size], self.__cycle)
+            offset += reduction.size
+
+        self.metrics.observe('reductions', time.time() - start)
+
+    def __reduction_data(self, variable, domain, dp):
+
+        # Reductions run in the simulation thread and see the current data, not the published snapshot.
+        if self.__snapshot is not None and not variable.static:
+            data = self.metrics.call('provider_variable', variable.name, domain, dp)
+        else:
+            data = self.__provide('variable', variable, domain, dp)
+
+        if variable.multi_component:
+            data = components_last(data, variable.components)
+
+        return data
+
+    def combine_reductions(self, buf, kinds):
+        """Combines the packed partial reduction results of all ranks, see visitor.reduction."""
+        return buf
+
+    def __provide(self, kind, entry, domain, dp):
+
+        dp = functools.partial(self.metrics.call, 'provider_' + kind, entry.name, domain, dp)
+
+        if entry.static:
+            try:
+                return entry.static_data[domain]
+            except KeyError:
+                data = freeze(dp())
+                entry.static_data[domain] = data
+                return data
+
+        if self.__snapshot is not None:
+            return self.__snapshot.get((kind, entry.name, domain))
+
+        if self.__cache is None:
+            return dp()
+
+        return self.__cache.get((kind, entry.name, domain, self.__cycle), dp)
+
+    def update_plots(self):
+
+        start = time.time()
+        VisItTimeStepChanged()
+        self.__buffers.advance()
+
+        changed = time.time()
+        VisItUpdatePlots()
+
+        updated = time.time()
+        VisItSynchronize()
+
+        end = time.time()
+
+        self.metrics.observe('time_step_changed', changed - start)
+        self.metrics.observe('update_plots', updated - changed)
+        self.metrics.observe('synchronize', end - updated)
+        self.updates.record(end - start)
+
+    def release_buffers(self):
+        self.__buffers.clear()
 
     def process_console_command(self):
 
@@ -201,27 +670,84 @@ class VisitInstrumentation(object):
     def __gc_run(self, *args):
         self.run_mode = VISIT_SIMMODE_RUNNING
         self.logger.info("Simulation running.")
+        self.__wake()
 
     def __gc_halt(self, *args):
         self.run_mode = VISIT_SIMMODE_STOPPED
         self.logger.info("Simulation stopped.")
     
     def __gc_step(self, *args):
+        if self.__snapshot is not None:
+            self.__step_request.set()
+            self.__wake()
+            return
+
         if callable(self.__step):
             self.__step()
+            self.__advance_cycle()
 
         if self.visit_is_connected:
-            VisItTimeStepChanged()
-            VisItUpdatePlots()
-            VisItSynchronize()
+            self.update_plots()
     
     def __gc_quit(self, *args):
         self.logger.info("Simulation done.")
         self.done = True
+        self.__wake()
 
     def __gc_mem_usage(self, *args):
         self.logger.info("VisIt Memory Usage: %s", str(VisItGetMemory()))
 
+    def __gc_metrics(self, *args):
+
+        self.logger.info("Latency histograms:\n%s" % self.metrics.summary())
+
+        if self.metrics_file is not None:
+            self.metrics.write(self.metrics_file)
+            self.logger.info("Latency histograms written to %s." % self.metrics_file)
+
+    def __gc_level_of_detail(self, *args):
+
+        strides = set(mesh.stride for mesh in self.__meshes.values())
+        stride = LOD_STRIDES[(LOD_STRIDES.index(max(strides | set([1]))) + 1) % len(LOD_STRIDES)]
+
+        self.set_level_of_detail(stride)
+
+        if self.visit_is_connected:
+            self.update_plots()
+
+    def __ui_level_of_detail(self, value, mesh_name):
+
+        self.set_level_of_detail(LOD_STRIDES[max(0, min(int(value), len(LOD_STRIDES) - 1))], mesh_name)
+
+        if self.visit_is_connected:
+            self.update_plots()
+
+    def set_level_of_detail(self, stride, mesh_name=None):
+        """
+        Serves rectilinear and curvilinear meshes (all or mesh_name) and their variables with every stride-th node.
+        Variables always follow the level of detail of their mesh.
+        """
+
+        if stride not in LOD_STRIDES:
+            raise ValueError('Level of detail stride must be one of %s!' % str(LOD_STRIDES))
+
+        if mesh_name is None:
+            meshes = self.__meshes.values()
+        else:
+            meshes = [self.__meshes[mesh_name]]
+
+        for mesh in meshes:
+            mesh.stride = stride
+
+        self.logger.info("Level of detail set to stride %d." % stride)
+
+    def register_ui_level_of_detail(self, name, mesh_name=None):
+        """Connects the ui element name (index 0 to 3) to the level of detail stride 1, 2, 4 or 8."""
+
+        self.logger.debug("Registered ui level of detail: %s." % (name))
+
+        VisItUI_valueChanged(name, self.__ui_level_of_detail, mesh_name)
+
     def __cb_command(self, command, visit_args, cbdata):
 
         self.logger.debug("VisIt command callback: %s" % (command))
@@ -247,132 +773,95 @@ class VisitInstrumentation(object):
         if callable(self.__cycle_time_provider):
             VisIt_SimulationMetaData_setCycleTime(md, *self.__cycle_time_provider())
 
-        for mesh_name in self.__meshes.keys():
-            mesh = self.__meshes[mesh_name]
-            mmd = VisIt_MeshMetaData_alloc()
-            if mmd != VISIT_INVALID_HANDLE:
-                if 'name' in mesh:
-                    VisIt_MeshMetaData_setName(mmd, mesh['name'])
-                if 'mesh_type' in mesh:
-                    VisIt_MeshMetaData_setMeshType(mmd, mesh['mesh_type'])
-                if 'topological_dimension' in mesh:
-                    VisIt_MeshMetaData_setTopologicalDimension(mmd, mesh['topological_dimension'])
-                else:
-                    VisIt_MeshMetaData_setTopologicalDimension(mmd, mesh['spatial_dimension'])
-                if 'spatial_dimension' in mesh:
-                    VisIt_MeshMetaData_setSpatialDimension(mmd, mesh['spatial_dimension'])
-                if 'number_of_domains' in mesh:
-                    VisIt_MeshMetaData_setNumDomains(mmd, mesh['number_of_domains'])
-                if 'domain_title' in mesh:
-                    VisIt_MeshMetaData_setDomainTitle(mmd, mesh['domain_title'])
-                if 'domain_piece_name' in mesh:
-                    VisIt_MeshMetaData_setDomainPieceName(mmd, mesh['domain_piece_name'])
-                if 'number_of_groups' in mesh:
-                    VisIt_MeshMetaData_setNumGroups(mmd, mesh['number_of_groups'])
-                if 'xunits' in mesh:
-                    VisIt_MeshMetaData_setXUnits(mmd, mesh['xunits'])
-                if 'yunits' in mesh:
-                    VisIt_MeshMetaData_setYUnits(mmd, mesh['yunits'])
-                if 'zunits' in mesh:
-                    VisIt_MeshMetaData_setZUnits(mmd, mesh['zunits'])
-                if 'xlabel' in mesh:
-                    VisIt_MeshMetaData_setXLabel(mmd, mesh['xlabel'])
-                if 'ylabel' in mesh:
-                    VisIt_MeshMetaData_setYLabel(mmd, mesh['ylabel'])
-                if 'zlabel' in mesh:
-                    VisIt_MeshMetaData_setZLabel(mmd, mesh['zlabel'])
-                VisIt_SimulationMetaData_addMesh(md, mmd)
-        
-        for var_name in self.__variables.keys():
-            variable = self.__variables[var_name]
-            vmd = VisIt_VariableMetaData_alloc()
-            if vmd != VISIT_INVALID_HANDLE:
-                if 'name' in variable:
-                    VisIt_VariableMetaData_setName(vmd, variable['name'])
-                if 'mesh_name' in variable:
-                    VisIt_VariableMetaData_setMeshName(vmd, variable['mesh_name'])
-                if 'type' in variable:
-                    VisIt_VariableMetaData_setType(vmd, variable['type'])
-                if 'centering' in variable:
-                    VisIt_VariableMetaData_setCentering(vmd, variable['centering'])
-                if 'units' in variable:
-                    VisIt_VariableMetaData_setUnits(vmd, variable['units'])
-                VisIt_SimulationMetaData_addVariable(md, vmd)
-
-        for curve_name in self.__curves.keys():
-            curve = self.__curves[curve_name]
-            cmd = VisIt_CurveMetaData_alloc()
-            if cmd != VISIT_INVALID_HANDLE:
-                if 'name' in curve:
-                    VisIt_CurveMetaData_setName(cmd, curve['name'])
-                if 'xlabel' in curve:
-                    VisIt_CurveMetaData_setXLabel(cmd, curve['xlabel'])
-                if 'xunits' in curve:
-                    VisIt_CurveMetaData_setXUnits(cmd, curve['xunits'])
-                if 'ylabel' in curve:
-                    VisIt_CurveMetaData_setYLabel(cmd, curve['ylabel'])
-                if 'yunits' in curve:
-                    VisIt_CurveMetaData_setYUnits(cmd, curve['yunits'])
-                VisIt_SimulationMetaData_addCurve(md, cmd)
-        
-        for exp_name in self.__expressions.keys():
-            expression = self.__expressions[exp_name]
-            emd = VisIt_ExpressionMetaData_alloc()
-            if emd != VISIT_INVALID_HANDLE:
-                if 'name' in expression:
-                    VisIt_ExpressionMetaData_setName(emd, expression['name'])
-                if 'definition' in expression:
-                    VisIt_ExpressionMetaData_setDefinition(emd, expression['definition'])
-                if 'type' in expression:
-                    VisIt_ExpressionMetaData_setType(emd, expression['type'])
-                VisIt_SimulationMetaData_addExpression(md, emd)
+        if self.__metadata is None:
+            self.__metadata = self.__compile_metadata()
+
+        for alloc, setters, add in self.__metadata:
+            h = alloc()
+            if h != VISIT_INVALID_HANDLE:
+                for setter, value in setters:
+                    setter(h, value)
+                add(md, h)
+
+        return md
+
+    def __compile_metadata(self):
+
+        self.logger.debug("Compiling metadata.")
+
+        metadata = list()
+
+        for mesh in self.__meshes.values():
+            metadata.append((VisIt_MeshMetaData_alloc, mesh.compile(setters(MESH_METADATA)), VisIt_SimulationMetaData_addMesh))
+
+        for variable in self.__variables.values():
+            metadata.append((VisIt_VariableMetaData_alloc, variable.compile(setters(VARIABLE_METADATA)), VisIt_SimulationMetaData_addVariable))
+
+        for curve in self.__curves.values():
+            metadata.append((VisIt_CurveMetaData_alloc, curve.compile(setters(CURVE_METADATA)), VisIt_SimulationMetaData_addCurve))
+
+        for expression in self.__expressions.values():
+            metadata.append((VisIt_ExpressionMetaData_alloc, expression.compile(setters(EXPRESSION_METADATA)), VisIt_SimulationMetaData_addExpression))
+
+        for material in self.__materials.values():
+            names = tuple((VisIt_MaterialMetaData_addMaterialName, name) for name in material.materials)
+            metadata.append((VisIt_MaterialMetaData_alloc, material.compile(setters(MATERIAL_METADATA)) + names, VisIt_SimulationMetaData_addMaterial))
+
+        for species in self.__species.values():
+            names = tuple((add_species_names, names) for names in species.species)
+            metadata.append((VisIt_SpeciesMetaData_alloc, species.compile(setters(SPECIES_METADATA)) + names, VisIt_SimulationMetaData_addSpecies))
 
         for cmd_name in self.commands['generic'].keys():
-            cmd = VisIt_CommandMetaData_alloc()
-            if cmd != VISIT_INVALID_HANDLE:
-                VisIt_CommandMetaData_setName(cmd, cmd_name)
-                VisIt_SimulationMetaData_addGenericCommand(md, cmd)
+            metadata.append((VisIt_CommandMetaData_alloc, ((VisIt_CommandMetaData_setName, cmd_name), ), VisIt_SimulationMetaData_addGenericCommand))
 
         for cmd_name in self.commands['custom'].keys():
-            cmd = VisIt_CommandMetaData_alloc()
-            if cmd != VISIT_INVALID_HANDLE:
-                VisIt_CommandMetaData_setName(cmd, cmd_name)
-                VisIt_SimulationMetaData_addCustomCommand(md, cmd)
+            metadata.append((VisIt_CommandMetaData_alloc, ((VisIt_CommandMetaData_setName, cmd_name), ), VisIt_SimulationMetaData_addCustomCommand))
 
-        return md
+        return metadata
+
+    def register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=0, number_of_domains=1, static=False, ghost=None, vtk_cells=False, interleaved=False, **kwargs):
+        """
+        ghost are the ghost zone layers of this domain of a rectilinear or curvilinear mesh: an int,
+        one int per axis or (low, high) per axis. The provider returns the full mesh including
+        ghosts (as do the providers of its variables), VisIt is told the real index range.
+
+        With vtk_cells, the provider of an unstructured mesh returns (x, y, z, types, offsets,
+        connectivity) in VTK layout, see visitor.unstructured.VTKConnectivity.
 
-    def register_mesh(self, name, dp, mesh_type, spatial_dimension, domain=0, number_of_domains=1, **kwargs):
+        With interleaved, the provider of a curvilinear or point mesh returns one array with the
+        coordinates along its last axis, e.g. (N, 3) or (nz, ny, nx, 3), the provider of an
+        unstructured mesh (points, connectivity, number_of_elements).
+        """
+
+        if interleaved and mesh_type not in (VISIT_MESHTYPE_CURVILINEAR, VISIT_MESHTYPE_POINT, VISIT_MESHTYPE_UNSTRUCTURED):
+            raise ValueError('Interleaved coordinates are only supported for curvilinear, point and unstructured meshes!')
 
         try:
             mesh = self.__meshes[name]
-        except:
-            mesh = dict()
+        except KeyError:
+            mesh = Mesh(name, mesh_type, spatial_dimension, number_of_domains, static=static, **kwargs)
+
+        mesh.interleaved = interleaved
 
         if domain is not 'omit':
-            if name in self.__meshes.keys() and domain in mesh['data_provider']:
+            if domain in mesh.data_provider:
                 raise ValueError('Mesh with name %s and domain %d is already registred!' % (name, domain))
 
-            try:
-                mesh['data_provider']
-            except:
-                mesh['data_provider'] = dict()
-
-            mesh['data_provider'][domain] = dp
-            self.logger.debug("Registered mesh %s, domain %d." % (name, domain))
+            dp = as_provider(dp)
+            if vtk_cells:
+                dp = VTKConnectivity(dp, interleaved)
 
-        if name not in self.__meshes.keys():
-            mesh['mesh_type'] = mesh_type
-            mesh['name'] = name
-            mesh['spatial_dimension'] = spatial_dimension
-            mesh['number_of_domains'] = number_of_domains
+            mesh.data_provider[domain] = dp
 
-            for key in kwargs.keys():
-                mesh[key] = kwargs[key]
+            if ghost is not None:
+                mesh.ghost[domain] = ghost_widths(ghost, spatial_dimension)
+            self.logger.debug("Registered mesh %s, domain %d." % (name, domain))
 
         if 'domain_piece_name' in kwargs:
-            mesh['domain_piece_name'] = kwargs['domain_piece_name']
+            mesh.update(domain_piece_name=kwargs['domain_piece_name'])
 
-        self.__meshes[name] = mesh 
+        self.__meshes[name] = mesh
+        self.__metadata = None
     
     def register_curve(self, name, dp, **kwargs):
 
@@ -383,21 +872,63 @@ class VisitInstrumentation(object):
                 self.logger.error('Curve with name %s is already registred!' % name)
                 raise ValueError('Curve with name %s is already registred!' % name)
 
-            curve = dict()
-            curve['data_provider'] = dp
-            curve['name'] = name
+            self.__curves[name] = Curve(name, dp, **kwargs)
+            self.__metadata = None
+
+    def register_history(self, name, capacity, max_points=None, dtype=np.float64, **kwargs):
+        """
+        Registers a time history curve of at most capacity points and returns it, the simulation
+        adds a point per cycle with history.append(x, y). See visitor.history.History.
+        """
+
+        history = History(capacity, max_points, dtype)
+        self.register_curve(name, history, **kwargs)
+
+        return history
+
+    def register_reduction(self, name, variable_name, reductions=('min', 'max', 'mean'), bins=None, range=None, capacity=10000, max_points=1000, ui=None):
+        """
+        Reduces variable variable_name over all domains after every cycle. reductions are some
+        of min, max, mean, std, sum and count, each served as history curve name/<reduction>,
+        bins equal bins over range as curve name/histogram. ui maps reductions to the names of
+        UI elements showing the current value. Returns the visitor.reduction.Reduction.
+        """
+
+        # Everything is checked before anything is registered, a failed call leaves nothing behind.
+        reduction = Reduction(name, variable_name, reductions, bins, range, capacity, max_points)
+
+        unknown = set(ui or ()) - set(reduction.reductions)
+        if unknown:
+            raise ValueError('UI elements given for reductions %s of %s, which are not computed!' % (sorted(unknown), name))
+
+        curves = ['%s/%s' % (name, r) for r in reduction.reductions] + (['%s/histogram' % name] if bins is not None else [])
+        taken = [curve for curve in curves if curve in self.__curves]
+        if taken or any(rd.name == name for rd in self.__reductions):
+            raise ValueError('Reduction with name %s is already registred!' % name)
+
+        for r in reduction.reductions:
+            self.register_curve('%s/%s' % (name, r), reduction.histories[r], xlabel='cycle', ylabel=r)
 
-            for key in kwargs.keys():
-                curve[key] = kwargs[key]
+        if bins is not None:
+            self.register_curve('%s/histogram' % name, reduction.histogram, xlabel=variable_name, ylabel='count')
 
-            self.__curves[name] = curve
+        for r, element in (ui or dict()).items():
+            self.register_ui_set_string(element, lambda r=r: '%g' % reduction.values[r])
+
+        self.__reductions.append(reduction)
+        self.__reduction_kinds = np.concatenate([rd.kinds for rd in self.__reductions])
+        self.__reduction_buffer = np.zeros(len(self.__reduction_kinds))
+
+        self.logger.debug("Registered reduction %s of variable %s." % (name, variable_name))
+
+        return reduction
 
     def __register_command(self, category, name, func, args):
 
         self.logger.debug("Registered command %s, category %s." % (name, category))
 
         if name in self.commands[category].keys():
-            self.logger.errer('Command with name %s is already registered!' % name)
+            self.logger.error('Command with name %s is already registered!' % name)
             raise ValueError('Command with name %s is already registered!' % name)
 
         command = dict()
@@ -405,6 +936,7 @@ class VisitInstrumentation(object):
         command['function'] = func
         command['arguments'] = args
         self.commands[category][name] = command
+        self.__metadata = None
 
     def register_console_command(self, name, func, args):
         self.__register_command('console', name, func, args)
@@ -447,124 +979,339 @@ class VisitInstrumentation(object):
         self.__ui_set_string[name] = func
         self.__ui_val_string_old[name] = ""
 
-    def register_variable(self, name, mesh_name, dp, var_type, centering, domain=0, **kwargs):
+    def register_variable(self, name, mesh_name, dp, var_type, centering, domain=0, static=False, **kwargs):
 
         self.logger.debug("Registered variable %s, domain %d." % (name, domain))
 
         try:
             variable = self.__variables[name]
-        except:
-            variable = dict()
+        except KeyError:
+            variable = Variable(name)
 
         if domain is not 'omit':
-            if name in self.__variables.keys() and domain in variable['data_provider']:
+            if domain in variable.data_provider:
                 self.logger.error('Variable with name %s and domain %d is already registred!' % (name, domain))
                 raise ValueError('Variable with name %s and domain %d is already registred!' % (name, domain))
 
-            try:
-                variable['data_provider']
-            except:
-                variable['data_provider'] = dict()
+        variable.data_provider[domain] = as_provider(dp)
+        variable.mesh_name = mesh_name
+        variable.static = static
+        variable.components = variable_components(var_type)
+        variable.multi_component = len(variable.components) > 0
+        variable.update(mesh_name=mesh_name, type=var_type, centering=centering, **kwargs)
+
+        self.__variables[name] = variable
+        self.__metadata = None
+
+    def register_material(self, name, mesh_name, dp, materials, domain=0, static=False):
+        """
+        materials are the names of the materials on mesh mesh_name. dp returns the material number
+        (index into materials) of every cell as integer array, or the volume fractions of every cell
+        as float array with the materials along its last axis, e.g. shape (cells, len(materials)).
+        """
+
+        self.logger.debug("Registered material %s, domain %d." % (name, domain))
 
-        variable['data_provider'][domain] = dp
-        variable['name'] = name
-        variable['mesh_name'] = mesh_name
-        variable['type'] = var_type
-        variable['centering'] = centering
+        try:
+            material = self.__materials[name]
+        except KeyError:
+            material = Material(name, mesh_name, materials)
+
+        if domain in material.data_provider:
+            raise ValueError('Material with name %s and domain %d is already registred!' % (name, domain))
+
+        material.data_provider[domain] = as_provider(dp)
+        material.static = static
+
+        self.__materials[name] = material
+        self.__metadata = None
+
+    def register_species(self, name, mesh_name, material_name, dp, species, domain=0, static=False):
+        """
+        species holds the species names of every material of material_name. dp returns (speclist,
+        species_mf, mix_spec) in the layout of libsim's VisIt_SpeciesData (mix_spec may be None).
+        """
 
-        for key in kwargs.keys():
-            variable[key] = kwargs[key]
+        self.logger.debug("Registered species %s, domain %d." % (name, domain))
 
-        self.__variables[name] = variable 
+        try:
+            entry = self.__species[name]
+        except KeyError:
+            entry = Species(name, mesh_name, material_name, species)
+
+        if domain in entry.data_provider:
+            raise ValueError('Species with name %s and domain %d is already registred!' % (name, domain))
+
+        entry.data_provider[domain] = as_provider(dp)
+        entry.static = static
+
+        self.__species[name] = entry
+        self.__metadata = None
 
     def register_expression(self, name, expr, var_type, **kwargs):
 
-        self.logger.debug("Registered expression %s, domain %d." % (name))
+        self.logger.debug("Registered expression %s." % (name))
 
         if name in self.__expressions.keys():
-            self.logger.errer('Variable with name %s is already registred!' % name)
+            self.logger.error('Variable with name %s is already registred!' % name)
             raise ValueError('Variable with name %s is already registred!' % name)
 
-        expression = dict()
-        expression['name'] = name
-        expression['type'] = var_type
-        expression['definition'] = expr
-
-        for key in kwargs.keys():
-            expression[key] = kwargs[key]
-
-        self.__expressions[name] = expression
+        self.__expressions[name] = Expression(name, type=var_type, definition=expr, **kwargs)
+        self.__metadata = None
 
     def __cb_domain_list(self, name, cbdata):
 
         self.logger.debug("VisIt domain list callback for mesh: %s" % (name))
+        self.__buffers.request(('domain_list', name, -1))
 
         h = VisIt_DomainList_alloc()
 
         if h == VISIT_INVALID_HANDLE:
             return h
 
-        hdl = VisIt_VariableData_alloc()
-
-        try:
-            domains = self.__meshes[name]['data_provider'].keys()
-            VisIt_VariableData_setDataI(hdl, VISIT_OWNER_VISIT, 1, len(domains), domains)
-        except:
-            domains = []
-
-        number_of_domains = self.__meshes[name]['number_of_domains']
+        number_of_domains, domains = self.get_domain_list(name)
         assert len(domains) <= number_of_domains
 
         self.logger.debug("Domain list contains %d domains (%s) for mesh: %s" % (number_of_domains, str(domains), name))
 
+        if len(domains) > 0:
+            hdl = self.__variable(domains)
+        else:
+            hdl = VisIt_VariableData_alloc()
+
         VisIt_DomainList_setDomains(h, number_of_domains, hdl)
 
         return h
 
+    def get_domain_list(self, name):
+        """Returns the total number of domains of mesh name and the domains served by this process."""
+
+        mesh = self.__meshes[name]
+        return mesh.number_of_domains, np.array(sorted(mesh.data_provider.keys()), dtype=np.int32)
+
+    def get_mesh_domains(self):
+        """Returns a dict of mesh name to (number of domains, domains served by this process)."""
+        return dict((name, VisitInstrumentation.get_domain_list(self, name)) for name in self.__meshes.keys())
+
     def __cb_mesh(self, domain, name, cbdata):
 
         self.logger.debug("VisIt callback for mesh %s, domain %d" % (name, domain))
+        self.__buffers.request(('mesh', name, domain))
 
         try:
             mesh = self.__meshes[name]
-            dp = mesh['data_provider'][domain]
-            if mesh['mesh_type'] == VISIT_MESHTYPE_UNSTRUCTURED:
-                 return self.__unstructured_mesh(*dp())
-            elif mesh['mesh_type'] == VISIT_MESHTYPE_CSG:
-                 return self.__csg_mesh(*dp())
-            elif mesh['mesh_type'] == VISIT_MESHTYPE_POINT:
-                 return self.__point_mesh(*dp())
-            elif mesh['mesh_type'] == VISIT_MESHTYPE_RECTILINEAR:
-                 return self.__rectilinear_mesh(*dp())
-            elif mesh['mesh_type'] == VISIT_MESHTYPE_CURVILINEAR:
-                 return self.__curvilinear_mesh(*dp())
+            dp = mesh.data_provider[domain]
+
+            if mesh.mesh_type in (VISIT_MESHTYPE_RECTILINEAR, VISIT_MESHTYPE_CURVILINEAR):
+                data = self.__level_of_detail('mesh', mesh.name, domain, mesh.stride, lambda: self.__structured_mesh_data(mesh, domain, dp), mesh.static)
+            else:
+                data = self.__provide('mesh', mesh, domain, dp)
+
+            if mesh.interleaved:
+                h = self.__interleaved_mesh(mesh.mesh_type, *data if isinstance(data, tuple) else (data, ))
+            else:
+                h = self.__mesh_builders[mesh.mesh_type](*data)
+
+            if domain in mesh.ghost and h != VISIT_INVALID_HANDLE:
+                self.__set_real_indices(mesh, domain, h)
+
+            return h
         except:
             return VISIT_INVALID_HANDLE
 
+    def __set_real_indices(self, mesh, domain, h):
+
+        dims = self.__mesh_dims.get((mesh.name, domain))
+        if dims is None:
+            self.logger.warn("Ghost zones of mesh %s, domain %d need coordinate arrays shaped like the mesh." % (mesh.name, domain))
+            return
+
+        low, high = real_indices(dims, mesh.ghost[domain], mesh.stride)
+        pad = [0] * (3 - len(dims))
+
+        if mesh.mesh_type == VISIT_MESHTYPE_RECTILINEAR:
+            VisIt_RectilinearMesh_setRealIndices(h, low + pad, high + pad)
+        else:
+            VisIt_CurvilinearMesh_setRealIndices(h, low + pad, high + pad)
+
+    def __level_of_detail(self, kind, name, domain, stride, decimate, static=False):
+
+        if stride == 1:
+            return decimate()
+
+        key = (kind, name, domain, stride)
+
+        # Decimated static data is converted once and kept across cycles, everything else per cycle.
+        cache = self.__static_lod_cache if static else self.__lod_cache
+
+        try:
+            return cache[key]
+        except KeyError:
+            data = decimate()
+            if static:
+                data = freeze(data)
+            cache[key] = data
+            return data
+
+    def __structured_mesh_data(self, mesh, domain, dp):
+
+        data = self.__provide('mesh', mesh, domain, dp)
+        rectilinear = mesh.mesh_type == VISIT_MESHTYPE_RECTILINEAR
+
+        dims = structured_dims(data, rectilinear, mesh.interleaved)
+        self.__mesh_dims[(mesh.name, domain)] = dims
+
+        if mesh.stride == 1 or dims is None:
+            return data
+
+        return decimate_mesh(data, dims, mesh.stride, rectilinear, mesh.interleaved)
+
+    def __variable_data(self, variable, domain, dp):
+
+        data = self.__provide('variable', variable, domain, dp)
+
+        if variable.multi_component:
+            data = components_last(data, variable.components)
+
+        try:
+            stride = self.__meshes[variable.mesh_name].stride
+            dims = self.__mesh_dims[(variable.mesh_name, domain)]
+        except KeyError:
+            return data
+
+        if stride == 1 or dims is None:
+            return data
+
+        decimate = decimate_nodes
+        if variable.metadata['centering'] == VISIT_VARCENTERING_ZONE:
+            decimate = decimate_zones
+
+        if not variable.multi_component:
+            return decimate(np.asarray(data), dims, stride)
+
+        if isinstance(data, tuple):
+            return tuple(decimate(np.asarray(c), dims, stride) for c in data)
+
+        data = np.asarray(data)
+        return decimate(data, dims, stride, data.shape[-1])
+
     def __cb_variable(self, domain, name, cbdata):
 
         self.logger.debug("VisIt callback for variable %s, domain %d" % (name, domain))
+        self.__buffers.request(('variable', name, domain))
 
         try:
             variable = self.__variables[name]
-            dp = variable['data_provider'][domain]
-            return self.__variable(dp())
+            dp = variable.data_provider[domain]
+            stride = self.__meshes[variable.mesh_name].stride if variable.mesh_name in self.__meshes else 1
+            data = self.__level_of_detail('variable', name, domain, stride, lambda: self.__variable_data(variable, domain, dp), variable.static)
+            if variable.multi_component:
+                return self.__multi_component_variable(data)
+            return self.__variable(data)
+        except ValueError as e:
+            self.logger.critical("Invalid data for variable %s, domain %d: %s" % (name, domain, e))
+            return VISIT_INVALID_HANDLE
         except:
             self.logger.critical("Inavlid handle for variable %s, domain %d" % (name, domain))
             return VISIT_INVALID_HANDLE
     
+    def __cb_material(self, domain, name, cbdata):
+
+        self.logger.debug("VisIt callback for material %s, domain %d" % (name, domain))
+        self.__buffers.request(('material', name, domain))
+
+        try:
+            material = self.__materials[name]
+            dp = material.data_provider[domain]
+            stride = self.__meshes[material.mesh_name].stride if material.mesh_name in self.__meshes else 1
+            return self.__material(material, self.__level_of_detail('material', name, domain, stride, lambda: self.__material_data(material, domain, dp), material.static))
+        except:
+            self.logger.critical("Inavlid handle for material %s, domain %d" % (name, domain))
+            return VISIT_INVALID_HANDLE
+
+    def __material_data(self, material, domain, dp):
+
+        data = np.asarray(self.__provide('material', material, domain, dp))
+
+        try:
+            stride = self.__meshes[material.mesh_name].stride
+            dims = self.__mesh_dims[(material.mesh_name, domain)]
+        except KeyError:
+            stride, dims = 1, None
+
+        if stride > 1 and dims is not None:
+            components = data.shape[-1] if data.dtype.kind == 'f' else 1
+            data = decimate_zones(data, dims, stride, components)
+
+        return material_lists(data, len(material.materials))
+
+    def __material(self, material, data):
+
+        h = VisIt_MaterialData_alloc()
+        if h == VISIT_INVALID_HANDLE:
+            return h
+
+        # Material numbers are assigned in the order of addMaterial.
+        for name in material.materials:
+            VisIt_MaterialData_addMaterial(h, name)
+
+        matlist, mixed = data
+        VisIt_MaterialData_setMaterials(h, self.__variable(matlist))
+
+        if mixed is not None:
+            VisIt_MaterialData_setMixedMaterials(h, *[self.__variable(a) for a in mixed])
+
+        return h
+
+    def __cb_species(self, domain, name, cbdata):
+
+        self.logger.debug("VisIt callback for species %s, domain %d" % (name, domain))
+        self.__buffers.request(('species', name, domain))
+
+        try:
+            species = self.__species[name]
+
+            if species.mesh_name in self.__meshes and self.__meshes[species.mesh_name].stride > 1:
+                self.logger.debug("Species %s are only served at full level of detail." % name)
+                return VISIT_INVALID_HANDLE
+
+            speclist, species_mf, mix_spec = self.__provide('species', species, domain, species.data_provider[domain])
+
+            h = VisIt_SpeciesData_alloc()
+            if h == VISIT_INVALID_HANDLE:
+                return h
+
+            for names in species.species:
+                hn = VisIt_NameList_alloc()
+                for species_name in names:
+                    VisIt_NameList_addName(hn, species_name)
+                VisIt_SpeciesData_addSpeciesName(h, hn)
+
+            VisIt_SpeciesData_setSpecies(h, self.__variable(speclist))
+            VisIt_SpeciesData_setSpeciesMF(h, self.__variable(species_mf))
+            if mix_spec is not None:
+                VisIt_SpeciesData_setMixedSpecies(h, self.__variable(mix_spec))
+
+            return h
+        except:
+            self.logger.critical("Inavlid handle for species %s, domain %d" % (name, domain))
+            return VISIT_INVALID_HANDLE
+
     def __cb_curve(self, name, cbdata):
 
         self.logger.debug("VisIt callback for curve: %s" % (name))
+        self.__buffers.request(('curve', name, -1))
 
         try:
             curve = self.__curves[name]
-            dp = curve['data_provider']
+            if self.__snapshot is not None:
+                return self.__curve(*self.__snapshot.get(('curve', name, -1)))
+            dp = curve.data_provider
             return self.__curve(*dp())
         except:
             return VISIT_INVALID_HANDLE
 
-    def __unstructured_mesh(self, x, y, connectivity, n_elements, z=None, owner=VISIT_OWNER_SIM):
+    def __unstructured_mesh(self, x, y, connectivity, n_elements, z=None, owner=None):
        
         h = VisIt_UnstructuredMesh_alloc()
         if h == VISIT_INVALID_HANDLE: return h
@@ -574,7 +1321,7 @@ class VisitInstrumentation(object):
         hc = self.__variable(connectivity, owner)
 
         if z is not None:
-            hz = self.__variable(z)
+            hz = self.__variable(z, owner)
             VisIt_UnstructuredMesh_setCoordsXYZ(h, hx, hy, hz)
         else:
             VisIt_UnstructuredMesh_setCoordsXY(h, hx, hy)
@@ -583,39 +1330,43 @@ class VisitInstrumentation(object):
 
         return h
 
-    def __curvilinear_mesh(self, xx, yy, zz=None, owner=VISIT_OWNER_SIM):
+    def __curvilinear_mesh(self, xx, yy, zz=None, owner=None):
 
         h = VisIt_CurvilinearMesh_alloc()
         if h == VISIT_INVALID_HANDLE: return h
-        
-        hx = self.__variable(xx)
-        hy = self.__variable(yy)
+
+        # Node dims (nx, ny[, nz]) from coordinate arrays shaped ([nz, ]ny, nx).
+        ndim = 2 if zz is None else 3
+        dims = list(np.shape(xx)[::-1]) + [1] * (ndim - np.ndim(xx))
+
+        hx = self.__variable(xx, owner)
+        hy = self.__variable(yy, owner)
 
         if zz is not None:
-            hz = self.__variable(zz)
-            VisIt_CurvilinearMesh_setCoordsXYZ(h, hx, hy, hz)
+            hz = self.__variable(zz, owner)
+            VisIt_CurvilinearMesh_setCoordsXYZ(h, dims, hx, hy, hz)
         else:
-            VisIt_CurvilinearMesh_setCoordsXY(h, hx, hy)
+            VisIt_CurvilinearMesh_setCoordsXY(h, dims, hx, hy)
 
         return h
 
-    def __rectilinear_mesh(self, x, y, z=None, owner=VISIT_OWNER_SIM):
+    def __rectilinear_mesh(self, x, y, z=None, owner=None):
 
         h = VisIt_RectilinearMesh_alloc()
         if h == VISIT_INVALID_HANDLE: return h
         
-        hx = self.__variable(x)
-        hy = self.__variable(y)
+        hx = self.__variable(x, owner)
+        hy = self.__variable(y, owner)
 
         if z is not None:
-            hz = self.__variable(z)
+            hz = self.__variable(z, owner)
             VisIt_RectilinearMesh_setCoordsXYZ(h, hx, hy, hz)
         else:
             VisIt_RectilinearMesh_setCoordsXY(h, hx, hy)
 
         return h
 
-    def __point_mesh(self, x, y, z=None, owner=VISIT_OWNER_SIM):
+    def __point_mesh(self, x, y, z=None, owner=None):
        
         h = VisIt_PointMesh_alloc()
         if h == VISIT_INVALID_HANDLE:
@@ -632,7 +1383,54 @@ class VisitInstrumentation(object):
 
         return h
    
-    def __csg_mesh(self, extents, bound_types, bound_coeffs, region_operators, leftids, rightids, zonelist, owner=VISIT_OWNER_SIM):
+    def __interleaved_mesh(self, mesh_type, coordinates, connectivity=None, n_elements=None, owner=None):
+        """
+        Curvilinear, point or unstructured mesh with interleaved coordinates: one array with the
+        coordinates along its last axis, e.g. (N, 3) or (nz, ny, nx, 3), handed over without copying.
+        """
+
+        coordinates = np.asarray(coordinates)
+        ndim = coordinates.shape[-1]
+
+        if coordinates.ndim < 2 or ndim not in (2, 3):
+            raise ValueError('Interleaved coordinates need the 2 or 3 coordinates along the last axis, got shape %s!' % str(coordinates.shape))
+
+        if mesh_type == VISIT_MESHTYPE_CURVILINEAR:
+            h = VisIt_CurvilinearMesh_alloc()
+            if h == VISIT_INVALID_HANDLE: return h
+
+            # Node dims (nx, ny[, nz]), a surface (ny, nx, 3) in 3d space has nz = 1.
+            dims = list(coordinates.shape[:-1][::-1])
+            if len(dims) > ndim:
+                raise ValueError('Interleaved coordinates of shape %s have more axes than the %d coordinates!' % (str(coordinates.shape), ndim))
+            dims += [1] * (ndim - len(dims))
+
+            hc = self.__multi_component_variable(coordinates, owner)
+
+            if ndim == 3:
+                VisIt_CurvilinearMesh_setCoords3(h, dims, hc)
+            else:
+                VisIt_CurvilinearMesh_setCoords2(h, dims, hc)
+
+        elif mesh_type == VISIT_MESHTYPE_POINT:
+            h = VisIt_PointMesh_alloc()
+            if h == VISIT_INVALID_HANDLE: return h
+
+            VisIt_PointMesh_setCoords(h, self.__multi_component_variable(coordinates, owner))
+
+        elif mesh_type == VISIT_MESHTYPE_UNSTRUCTURED:
+            h = VisIt_UnstructuredMesh_alloc()
+            if h == VISIT_INVALID_HANDLE: return h
+
+            VisIt_UnstructuredMesh_setCoords(h, self.__multi_component_variable(coordinates, owner))
+            VisIt_UnstructuredMesh_setConnectivity(h, n_elements, self.__variable(connectivity, owner))
+
+        else:
+            raise ValueError('Interleaved coordinates are not supported for mesh type %d!' % mesh_type)
+
+        return h
+
+    def __csg_mesh(self, extents, bound_types, bound_coeffs, region_operators, leftids, rightids, zonelist, owner=None):
 
         h = VisIt_CSGMesh_alloc()
         if h == VISIT_INVALID_HANDLE:
@@ -655,17 +1453,27 @@ class VisitInstrumentation(object):
 
         return h
  
-    def __variable(self, data, owner=VISIT_OWNER_SIM):
+    def __variable(self, data, owner=None):
+
+        if owner is None:
+            owner = VISIT_OWNER_SIM
 
         dtype, size, owner = get_dtype_size_owner(data, owner, repl_owner=VISIT_OWNER_COPY)
 
         if dtype is None or size is None:
             return VISIT_INVALID_HANDLE
 
+        scratch = False
+        if owner == VISIT_OWNER_SIM:
+            data, scratch = self.__buffers.prepare(data, VISIT_DTYPES[dtype])
+
         h = VisIt_VariableData_alloc()
         if h == VISIT_INVALID_HANDLE:
             return h
 
+        if owner == VISIT_OWNER_SIM:
+            self.__buffers.pin(h, data, scratch)
+
         if dtype == 'I':
             VisIt_VariableData_setDataI(h, owner, 1, size, data)
         elif dtype == 'D':
@@ -674,8 +1482,56 @@ class VisitInstrumentation(object):
             VisIt_VariableData_setDataF(h, owner, 1, size, data)
 
         return h
+
+    def __multi_component_variable(self, data, owner=None):
+        """
+        data is an array with the components along its last axis (e.g. (N, 3)), handed over
+        like a scalar with nComps set, or a tuple of k component arrays. Components are
+        passed separately if libsim supports it, otherwise interleaved into a pooled buffer.
+        """
+
+        if owner is None:
+            owner = VISIT_OWNER_SIM
+
+        if isinstance(data, tuple):
+            components = tuple(np.asarray(c) for c in data)
+            k = len(components)
+            dtype, size, owner = get_dtype_size_owner(components[0], owner, repl_owner=VISIT_OWNER_COPY)
+        else:
+            components = None
+            data = np.asarray(data)
+            k = data.shape[-1]
+            dtype, size, owner = get_dtype_size_owner(data, owner, repl_owner=VISIT_OWNER_COPY)
+            if size is not None:
+                size //= k
+
+        if dtype is None or size is None:
+            return VISIT_INVALID_HANDLE
+
+        h = VisIt_VariableData_alloc()
+        if h == VISIT_INVALID_HANDLE:
+            return h
+
+        set_array_data = globals().get('VisIt_VariableData_setArrayData' + dtype)
+
+        if components is not None and set_array_data is not None:
+            for i, component in enumerate(components):
+                component, scratch = self.__buffers.prepare(component, VISIT_DTYPES[dtype])
+                self.__buffers.pin(h, component, scratch)
+                set_array_data(h, i, owner, size, 0, component.itemsize, component)
+            return h
+
+        if components is not None:
+            data, scratch = self.__buffers.interleave(components, VISIT_DTYPES[dtype]), True
+        else:
+            data, scratch = self.__buffers.prepare(data, VISIT_DTYPES[dtype])
+
+        self.__buffers.pin(h, data, scratch)
+        globals()['VisIt_VariableData_setData' + dtype](h, owner, k, size, data)
+
+        return h
     
-    def __curve(self, x, y, owner=VISIT_OWNER_SIM):
+    def __curve(self, x, y, owner=None):
 
         h = VisIt_CurveData_alloc()
         if h == VISIT_INVALID_HANDLE:
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import threading
+
+import numpy as np
+
+__author__ = 'Christoph Statz'
+
+
+def copy_into(target, data):
+    """Copies data, reusing the arrays of target where shape and dtype still match."""
+
+    if isinstance(data, tuple):
+        if not isinstance(target, tuple) or len(target) != len(data):
+            target = (None, ) * len(data)
+        return tuple(copy_into(t, d) for t, d in zip(target, data))
+
+    if isinstance(data, np.ndarray):
+        # Read-only arrays (e.g. memory mapped files) cannot change under VisIt, they are referenced.
+        if not data.flags.writeable:
+            return data
+        if isinstance(target, np.ndarray) and target.shape == data.shape and target.dtype == data.dtype:
+            np.copyto(target, data)
+            return target
+        return np.array(data, order='C')
+
+    if isinstance(data, list):
+        return list(data)
+
+    return data
+
+
+class Snapshot(object):
+    """
+    Double buffered copy of the registered provider data.
+
+    The simulation thread writes into the back buffer at cycle boundaries
+    (publish), the VisIt service thread swaps it to the front (adopt) and
+    serves every callback from the front buffer. Read-only arrays are
+    referenced instead of copied. The old front buffer may
+    still be referenced by VisIt until the plots were updated with the new
+    one, it is handed back to the simulation thread by release. Until then,
+    publish skips cycles instead of blocking the simulation.
+    """
+
+    def __init__(self):
+
+        self.__lock = threading.Lock()
+        self.__front = dict()
+        self.__back = dict()
+        self.__ready = False
+        self.__free = True
+        self.__back_cycle = None
+        self.cycle = None
+
+    def publish(self, cycle, items):
+        """items is an iterable of (key, data), it is consumed while the back buffer is locked."""
+
+        with self.__lock:
+            if not self.__free:
+                return False
+
+            back = dict()
+            for key, data in items:
+                back[key] = copy_into(self.__back.get(key), data)
+
+            self.__back = back
+            self.__back_cycle = cycle
+            self.__ready = True
+
+        return True
+
+    def adopt(self):
+
+        with self.__lock:
+            if not self.__ready:
+                return False
+
+            self.__front, self.__back = self.__back, self.__front
+            self.cycle = self.__back_cycle
+            self.__ready = False
+            self.__free = False
+
+        return True
+
+    def release(self):
+
+        with self.__lock:
+            self.__free = True
+
+    def get(self, key):
+        return self.__front[key]
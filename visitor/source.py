@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import mmap
+
+import numpy as np
+
+__author__ = 'Christoph Statz'
+
+
+class FileSource(object):
+    """
+    Data provider reading an array from a file through a read-only memory map.
+
+    filename is either a .npy file or a raw binary file, which needs dtype and
+    shape (and optionally offset in bytes and order). The file is mapped on the
+    first call and the map is kept, so only the pages VisIt actually touches are
+    read. Arrays of a dtype libsim understands are handed over without copying.
+    """
+
+    def __init__(self, filename, dtype=None, shape=None, offset=0, order='C'):
+
+        if not filename.endswith('.npy') and (dtype is None or shape is None):
+            raise ValueError('Raw file %s needs dtype and shape!' % filename)
+
+        self.filename = filename
+        self.dtype = dtype
+        self.shape = shape
+        self.offset = offset
+        self.order = order
+        self.__array = None
+
+    def __call__(self, *args, **kwargs):
+
+        if self.__array is None:
+            if self.filename.endswith('.npy'):
+                self.__array = np.load(self.filename, mmap_mode='r')
+            else:
+                self.__array = np.memmap(self.filename, dtype=self.dtype, mode='r', offset=self.offset, shape=self.shape, order=self.order)
+
+        return self.__array
+
+    def close(self):
+        """Drops the map, the file is mapped again on the next call."""
+        self.__array = None
+
+
+def as_array_provider(source):
+
+    if isinstance(source, str):
+        return FileSource(source)
+
+    if isinstance(source, np.ndarray):
+        return lambda: source
+
+    return source
+
+
+def as_provider(dp):
+    """
+    Turns the file-backed sources accepted by register_mesh and register_variable into a data provider.
+
+    dp is a data provider (callable), an array (e.g. np.memmap), the name of a .npy file or a FileSource.
+    For meshes, it may be a tuple of these mixed with plain values like the number of elements.
+    """
+
+    if isinstance(dp, tuple):
+        items = tuple(as_array_provider(d) for d in dp)
+        return lambda *args, **kwargs: tuple(d() if callable(d) else d for d in items)
+
+    return as_array_provider(dp)
+
+
+def is_file_backed(data):
+    """True if data is (a view of) a memory mapped file, its pages are not held in memory by the instrumentation."""
+
+    while isinstance(data, np.ndarray):
+        data = data.base
+
+    return isinstance(data, mmap.mmap)
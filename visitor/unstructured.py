@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import numpy as np
+
+from . import libsim
+
+__author__ = 'Christoph Statz'
+
+
+# VTK cell type id to the name of the matching VisIt cell type. Nodes are ordered like in VTK.
+VTK_CELL_TYPES = {
+    1: 'VISIT_CELL_POINT',
+    3: 'VISIT_CELL_BEAM',
+    5: 'VISIT_CELL_TRI',
+    9: 'VISIT_CELL_QUAD',
+    10: 'VISIT_CELL_TET',
+    12: 'VISIT_CELL_HEX',
+    13: 'VISIT_CELL_WEDGE',
+    14: 'VISIT_CELL_PYR',
+    21: 'VISIT_CELL_QUADRATIC_EDGE',
+    22: 'VISIT_CELL_QUADRATIC_TRI',
+    23: 'VISIT_CELL_QUADRATIC_QUAD',
+    24: 'VISIT_CELL_QUADRATIC_TET',
+    25: 'VISIT_CELL_QUADRATIC_HEX',
+    26: 'VISIT_CELL_QUADRATIC_WEDGE',
+    27: 'VISIT_CELL_QUADRATIC_PYR',
+    28: 'VISIT_CELL_BIQUADRATIC_QUAD',
+    29: 'VISIT_CELL_TRIQUADRATIC_HEX',
+    30: 'VISIT_CELL_QUADRATIC_LINEAR_QUAD',
+    31: 'VISIT_CELL_QUADRATIC_LINEAR_WEDGE',
+    32: 'VISIT_CELL_BIQUADRATIC_QUADRATIC_WEDGE',
+    33: 'VISIT_CELL_BIQUADRATIC_QUADRATIC_HEX',
+    34: 'VISIT_CELL_BIQUADRATIC_TRI',
+}
+
+_lookup = None
+
+
+def cell_type_lookup():
+    """Array mapping VTK cell type ids to VisIt cell types, -1 for types libsim does not know."""
+
+    global _lookup
+
+    if _lookup is None:
+        simV2 = libsim.load()
+        _lookup = np.full(max(VTK_CELL_TYPES) + 1, -1, dtype=np.int32)
+        for vtk_type, name in VTK_CELL_TYPES.items():
+            _lookup[vtk_type] = getattr(simV2, name, -1)
+
+    return _lookup
+
+
+def vtk_to_visit_connectivity(types, offsets, connectivity):
+    """
+    Converts cells in VTK layout to libsim's connectivity list (cell type followed by its nodes).
+
+    types holds the VTK cell type id of every cell, connectivity the nodes of all cells and
+    offsets either the start of every cell in connectivity plus the end of the last one
+    (len(types) + 1 entries, VTK >= 9) or the end of every cell (len(types) entries, VTK XML).
+    Returns the connectivity list and the number of cells.
+    """
+
+    types = np.asarray(types).reshape(-1)
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1)
+    connectivity = np.asarray(connectivity).reshape(-1)
+
+    n = len(types)
+
+    if len(offsets) == n:
+        offsets = np.concatenate(((0, ), offsets))
+    elif len(offsets) != n + 1:
+        raise ValueError('Expected %d or %d offsets for %d cells, got %d!' % (n, n + 1, n, len(offsets)))
+
+    lookup = cell_type_lookup()
+    valid = (types >= 0) & (types < len(lookup))
+    visit_types = np.where(valid, lookup[np.where(valid, types, 0)], -1)
+
+    if (visit_types < 0).any():
+        raise ValueError('VTK cell types %s are not supported by libsim!' % str(np.unique(types[visit_types < 0])))
+
+    # Every cell is shifted by one entry per preceding cell, its type is written in front.
+    nodes = connectivity[offsets[0]:offsets[-1]]
+    headers = offsets[:-1] - offsets[0] + np.arange(n)
+
+    result = np.empty(len(nodes) + n, dtype=np.int32)
+    result[headers] = visit_types
+
+    mask = np.ones(len(result), dtype=bool)
+    mask[headers] = False
+    result[mask] = nodes
+
+    return result, n
+
+
+class VTKConnectivity(object):
+    """
+    Data provider adapter for unstructured meshes in VTK layout.
+
+    dp returns (x, y, z, types, offsets, connectivity), z may be None, or with interleaved
+    (points, types, offsets, connectivity) with coordinates of shape (N, ndim).
+    The libsim connectivity is rebuilt only if dp returns other topology arrays than
+    before, a topology changed in place has to be announced with invalidate().
+    """
+
+    def __init__(self, dp, interleaved=False):
+
+        self.dp = dp
+        self.interleaved = interleaved
+        self.__topology = None
+        self.__result = None
+
+    def __call__(self, *args, **kwargs):
+
+        data = self.dp(*args, **kwargs)
+        types, offsets, connectivity = data[-3:]
+
+        topology = (types, offsets, connectivity)
+        if self.__topology is None or any(a is not b for a, b in zip(topology, self.__topology)):
+            self.__result = vtk_to_visit_connectivity(types, offsets, connectivity)
+            self.__topology = topology
+
+        cells, n = self.__result
+
+        if self.interleaved:
+            return data[0], cells, n
+
+        x, y, z = data[:3]
+        return x, y, cells, n, z
+
+    def invalidate(self):
+        self.__topology = None